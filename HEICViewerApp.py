@@ -1,39 +1,2142 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, Scrollbar, Canvas, Frame, Label, Entry, Scale, StringVar, IntVar, DoubleVar, \
     BooleanVar, ttk, Menu, colorchooser, simpledialog
-from PIL import Image, ImageTk, ImageOps, ImageEnhance, ImageFilter, ExifTags
-from pillow_heif import register_heif_opener
+from PIL import Image, ImageTk, ImageOps, ImageEnhance, ImageFilter, ImageMath, ImageChops, ExifTags, \
+    UnidentifiedImageError, TiffImagePlugin
 import os
 import json
 import sys
 import time
 from datetime import datetime
 from functools import partial
-from threading import Thread
+from collections import OrderedDict
+from threading import Thread, Event, Condition, Lock, get_ident
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import queue
+import csv
+import io
+import argparse
+import hashlib
+import shutil
+import sqlite3
+import re
+import select
+import socket
+import struct
+import zlib
+from array import array
+import ctypes
+import ctypes.util
 import pickle
 import math
+import weakref
+
+
+def process_start_time():
+    # Monotonic timestamp of process start so --profile-startup includes interpreter start-up and imports;
+    # without /proc the clock starts when this module is imported.
+    try:
+        with open("/proc/self/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return time.monotonic() - (time.clock_gettime(time.CLOCK_BOOTTIME) - started)
+    except (OSError, ValueError, AttributeError, IndexError):
+        return time.monotonic()
+
+
+STARTUP_TIME = process_start_time()
+
+BATCH_STAGES = ("decode", "resize", "convert", "encode")
+BATCH_FORMATS = {"jpg": "JPEG", "png": "PNG", "webp": "WEBP", "tiff": "TIFF", "bmp": "BMP"}
+
+# "default" passes no extra encoder options, so saves stay identical to plain Image.save() unless a preset is chosen
+ENCODER_PRESETS = {
+    "JPEG": {
+        "default": {},
+        "fastest": {"optimize": False, "progressive": False, "subsampling": "4:2:0"},
+        "balanced": {"optimize": True, "progressive": False, "subsampling": "4:2:0"},
+        "smallest": {"optimize": True, "progressive": True, "subsampling": "4:2:0"}
+    },
+    "WEBP": {
+        "default": {},
+        "fastest": {"method": 0},
+        "balanced": {"method": 4},
+        "smallest": {"method": 6}
+    },
+    "PNG": {
+        "default": {},
+        "fastest": {"compress_level": 1},
+        "balanced": {"compress_level": 6},
+        "smallest": {"compress_level": 9, "optimize": True}
+    },
+    "TIFF": {
+        "default": {},
+        "fastest": {},
+        "balanced": {"compression": "tiff_lzw"},
+        "smallest": {"compression": "tiff_adobe_deflate"}
+    }
+}
+PRESET_NAMES = ("default", "fastest", "balanced", "smallest")
+
+
+heif_registered = False
+heif_lock = Lock()
+
+
+def ensure_heif_support():
+    # pillow_heif pulls in libheif and its codecs, so it is only loaded once a HEIF file is actually opened
+    global heif_registered
+    with heif_lock:
+        if not heif_registered:
+            from pillow_heif import register_heif_opener
+            register_heif_opener()
+            heif_registered = True
+
+
+def open_image(file_path):
+    if not heif_registered and os.path.splitext(file_path)[1].lower() in HEIF_EXTENSIONS:
+        ensure_heif_support()
+    try:
+        return Image.open(file_path)
+    except UnidentifiedImageError:
+        # A HEIF file saved under another extension is only recognised once the plugin is registered
+        if heif_registered:
+            raise
+        ensure_heif_support()
+        return Image.open(file_path)
+
+
+def decode_frame(file_path, frame_index=0):
+    # HEIF containers can hold several top-level images; only the requested one is decoded
+    img = open_image(file_path)
+    if frame_index:
+        img.seek(frame_index)
+    orientation = img.getexif().get(EXIF_TAG_ORIENTATION, 1)
+    img.load()
+    return apply_exif_orientation(img, orientation)
+
+
+def apply_exif_orientation(img, orientation=None):
+    # Done once per decode so the cached image is already upright; HEIF decoders apply irot/imir themselves.
+    # Pillow's TIFF loader transposes and drops the tag on load(), so `orientation` is the tag read before it.
+    # info["applied_orientation"] is only set when the pixels were actually turned.
+    stored = img.getexif().get(EXIF_TAG_ORIENTATION, 1)
+    method = ORIENTATION_TRANSPOSES.get(stored)
+    if method is not None:
+        img = img.transpose(method)
+        img.info["applied_orientation"] = stored
+    elif ORIENTATION_TRANSPOSES.get(orientation) is not None:
+        img.info["applied_orientation"] = orientation
+    return img
+
+
+def oriented_size(img):
+    # Pillow already reports TIFF sizes with the orientation applied
+    width, height = img.size
+    if img.format != "TIFF" and img.getexif().get(EXIF_TAG_ORIENTATION, 1) in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+
+def decode_high_bit_frame(file_path, frame_index=0):
+    # Returns None for 8-bit sources, which gain nothing from the 16-bit pipeline
+    ensure_heif_support()
+    import pillow_heif
+    frame = pillow_heif.open_heif(file_path, convert_hdr_to_8bit=False)[frame_index]
+    if not frame.mode.endswith(";16"):
+        return None
+    return HighBitImage.from_interleaved(frame.mode, frame.size, frame.data, frame.stride)
+
+
+def to_display(img):
+    return img.to_8bit() if isinstance(img, HighBitImage) else img
+
+
+def encoder_params(format_name, preset):
+    return dict(ENCODER_PRESETS.get(format_name, {}).get(preset, {}))
+
+
+def run_encoder_benchmark(file_paths, quality=90, formats=("JPEG", "WEBP", "PNG", "TIFF")):
+    totals = {(format_name, preset): [0.0, 0] for format_name in formats for preset in PRESET_NAMES}
+
+    for file_path in file_paths:
+        img = open_image(file_path)
+        img.load()
+        if img.mode == 'RGBA':
+            rgb_img = Image.new('RGB', img.size, (255, 255, 255))
+            rgb_img.paste(img, mask=img.split()[3])
+            img = rgb_img
+        elif img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+
+        for format_name in formats:
+            for preset in PRESET_NAMES:
+                params = encoder_params(format_name, preset)
+                if format_name in ("JPEG", "WEBP"):
+                    params["quality"] = quality
+
+                buffer = io.BytesIO()
+                start = time.perf_counter()
+                img.save(buffer, format=format_name, **params)
+                totals[(format_name, preset)][0] += (time.perf_counter() - start) * 1000
+                totals[(format_name, preset)][1] += buffer.tell()
+
+    return [(format_name, preset, encode_ms, size) for (format_name, preset), (encode_ms, size) in totals.items()]
+
+
+def format_benchmark_table(rows, file_count):
+    lines = [f"Encoder benchmark over {file_count} file(s)",
+             f"{'Format':<8}{'Preset':<10}{'Encode ms':>12}{'Output KB':>12}"]
+    for format_name, preset, encode_ms, size in rows:
+        lines.append(f"{format_name:<8}{preset:<10}{encode_ms:>12.0f}{size / 1024:>12.0f}")
+    return "\n".join(lines)
+
+
+def make_output_spec(target_format, quality, size=None, maintain_aspect=True, suffix="", target_bytes=None,
+                     preset="default"):
+    return {
+        "format": target_format.lower(),
+        "quality": quality,
+        "size": size,
+        "maintain_aspect": maintain_aspect,
+        "suffix": suffix,
+        "target_bytes": target_bytes,
+        "preset": preset
+    }
+
+
+def encode_to_target_size(img, format_name, target_bytes, **params):
+    # Binary search over quality, encoding into memory, keeping the largest result that fits.
+    best = None
+    smallest = None
+    trials = 0
+    low, high = 1, 100
+
+    while low <= high:
+        quality = (low + high) // 2
+        buffer = io.BytesIO()
+        img.save(buffer, format=format_name, quality=quality, **params)
+        trials += 1
+
+        if buffer.tell() <= target_bytes:
+            best = (buffer.getvalue(), quality)
+            low = quality + 1
+        else:
+            smallest = (buffer.getvalue(), quality)
+            high = quality - 1
+
+    # Nothing fits: fall back to the lowest quality tried, which is the smallest encode
+    fits = best is not None
+    data, quality = best if fits else smallest
+    return data, quality, trials, fits
+
+
+def parse_output_specs(text, default_quality, preset="default"):
+    # Comma separated "format[:quality[:max_size]]" entries, e.g. "webp:85:2048, jpg:80:256".
+    # A quality written as "<n>kb" (e.g. "jpg:500kb") asks for the best quality under that size.
+    specs = []
+    for entry in text.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+
+        parts = [part.strip() for part in entry.split(":")]
+        if len(parts) > 3 or parts[0].lower() not in BATCH_FORMATS:
+            raise ValueError(f"Invalid output '{entry}', expected format[:quality[:max_size]]")
+
+        quality = default_quality
+        target_bytes = None
+        try:
+            if len(parts) > 1 and parts[1].lower().endswith("kb"):
+                target_bytes = int(parts[1][:-2]) * 1024
+            elif len(parts) > 1 and parts[1]:
+                quality = int(parts[1])
+            max_size = int(parts[2]) if len(parts) > 2 and parts[2] else None
+        except ValueError:
+            raise ValueError(f"Invalid output '{entry}', quality and size must be whole numbers")
+
+        if not 1 <= quality <= 100 or (max_size is not None and max_size <= 0) or \
+                (target_bytes is not None and target_bytes <= 0):
+            raise ValueError(f"Invalid output '{entry}', quality must be 1-100 and sizes positive")
+
+        if max_size:
+            spec = make_output_spec(parts[0], quality, (max_size, max_size), True, f"_{max_size}", target_bytes,
+                                    preset)
+        else:
+            spec = make_output_spec(parts[0], quality, suffix=f"_{len(specs) + 1}", target_bytes=target_bytes,
+                                    preset=preset)
+
+        # Output names are built from format and suffix only, so a repeat would silently overwrite the earlier file
+        if any(other["format"] == spec["format"] and other["suffix"] == spec["suffix"] for other in specs):
+            raise ValueError(f"Invalid output '{entry}', it would overwrite an earlier {spec['format']} output "
+                             f"with the same name")
+        specs.append(spec)
+    return specs
+
+
+def unique_output_stems(file_paths):
+    # Files from different folders can share a name; later ones get a numeric suffix so outputs never collide
+    stems = {}
+    taken = set()
+    for file_path in file_paths:
+        stem = os.path.splitext(os.path.basename(file_path))[0]
+        candidate = stem
+        counter = 2
+        while candidate.lower() in taken:
+            candidate = f"{stem}_{counter}"
+            counter += 1
+        taken.add(candidate.lower())
+        stems[file_path] = candidate
+    return stems
+
+
+def hash_file(file_path, chunk_size=1024 * 1024, cancel_event=None):
+    # Returns None when cancelled part way, so a large file does not hold up the cancel
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def group_duplicates(file_paths, workers, cancel_event=None):
+    # Returns one list per unique content, first occurrence first, in input order; nothing once cancelled
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        digests = list(executor.map(lambda file_path: hash_file(file_path, cancel_event=cancel_event), file_paths))
+
+    if cancel_event is not None and cancel_event.is_set():
+        return []
+
+    groups = {}
+    for file_path, digest in zip(file_paths, digests):
+        groups.setdefault(digest, []).append(file_path)
+    return list(groups.values())
+
+
+def link_or_copy(source, destination):
+    if os.path.abspath(source) == os.path.abspath(destination):
+        return
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def estimate_decode_memory(file_path):
+    # Header-only open: Image.open reads dimensions and mode without decoding pixels.
+    with open_image(file_path) as img:
+        width, height = img.size
+        mode = img.mode
+
+    if mode in ("1", "L", "P"):
+        bytes_per_pixel = 1
+    elif mode.startswith("I;16"):
+        bytes_per_pixel = 2
+    else:
+        # Pillow stores RGB, YCbCr and friends padded to 32 bits per pixel
+        bytes_per_pixel = 4
+
+    # The decoded frame plus one full-size working copy (resize or colour conversion)
+    return width * height * bytes_per_pixel * 2
+
+
+class MemoryBudget:
+    def __init__(self, limit_bytes):
+        self.limit = limit_bytes
+        self.in_flight = 0
+        self.condition = Condition()
+
+    def acquire(self, amount, cancel_event=None):
+        with self.condition:
+            # A job larger than the whole budget is still admitted once nothing else is in flight
+            while self.in_flight and self.in_flight + amount > self.limit:
+                if cancel_event is not None and cancel_event.is_set():
+                    return False
+                self.condition.wait(0.1)
+
+            self.in_flight += amount
+            return True
+
+    def release(self, amount):
+        with self.condition:
+            self.in_flight -= amount
+            self.condition.notify_all()
+
+
+def output_target_size(image_size, spec):
+    if not spec["size"]:
+        return image_size
+
+    width, height = spec["size"]
+    if not spec["maintain_aspect"]:
+        return width, height
+
+    # Same fit-within-box behaviour as Image.thumbnail, which never upscales
+    scale = min(width / image_size[0], height / image_size[1], 1.0)
+    return max(1, round(image_size[0] * scale)), max(1, round(image_size[1] * scale))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def summarize_batch_records(records):
+    summary = {}
+    for key in [f"{stage}_ms" for stage in BATCH_STAGES] + ["total_ms", "bytes_in", "bytes_out"]:
+        values = [record[key] for record in records]
+        summary[key] = {
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "max": max(values) if values else 0.0
+        }
+    return summary
+
+
+def write_batch_report(folder, records):
+    summary = summarize_batch_records(records)
+
+    with open(os.path.join(folder, "batch_report.json"), 'w') as f:
+        json.dump({"files": records, "summary": summary}, f, indent=2)
+
+    with open(os.path.join(folder, "batch_report.csv"), 'w', newline='') as f:
+        fields = ["file", "output_count", "bytes_in", "bytes_out", "estimated_memory", "trial_encodes"] + \
+                 [f"{stage}_ms" for stage in BATCH_STAGES] + ["total_ms"]
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(records)
+
+    return summary
+
+
+IMAGE_EXTENSIONS = ('.heic', '.heif', '.jpg', '.jpeg', '.png', '.tif', '.tiff')
+HEIF_EXTENSIONS = ('.heic', '.heif')
+
+EXTENSION_FORMATS = {'.heic': "HEIF", '.heif': "HEIF", '.jpg': "JPEG", '.jpeg': "JPEG", '.png': "PNG", '.tif': "TIFF",
+                     '.tiff': "TIFF"}
+
+SORT_ORDERS = [
+    ("Name", "name"),
+    ("Name (Natural Numbers)", "natural"),
+    ("Date Modified", "mtime"),
+    ("Capture Date", "capture_date"),
+    ("File Size", "size")
+]
+
+EXIF_IFD_POINTER = 0x8769
+EXIF_GPS_IFD_POINTER = 0x8825
+EXIF_TAG_MAKE = 0x010F
+EXIF_TAG_MODEL = 0x0110
+EXIF_TAG_ORIENTATION = 0x0112
+EXIF_TAG_DATETIME = 0x0132
+EXIF_TAG_DATETIME_ORIGINAL = 0x9003
+
+
+def natural_sort_key(text):
+    # "IMG_2.heic" sorts before "IMG_10.heic"
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', text)]
+
+
+def read_exif_thumbnail(exif_bytes):
+    # The EXIF thumbnail is a small JPEG referenced from IFD1 (JPEGInterchangeFormat/-Length)
+    data = exif_bytes[6:] if exif_bytes.startswith(b"Exif\x00\x00") else exif_bytes
+    try:
+        endian = "<" if data[:2] == b"II" else ">"
+        ifd0 = struct.unpack_from(endian + "I", data, 4)[0]
+        count = struct.unpack_from(endian + "H", data, ifd0)[0]
+        ifd1 = struct.unpack_from(endian + "I", data, ifd0 + 2 + count * 12)[0]
+        if not ifd1:
+            return None
+
+        offset = length = None
+        count = struct.unpack_from(endian + "H", data, ifd1)[0]
+        for i in range(count):
+            tag, _, _, value = struct.unpack_from(endian + "HHII", data, ifd1 + 2 + i * 12)
+            if tag == 0x0201:
+                offset = value
+            elif tag == 0x0202:
+                length = value
+    except struct.error:
+        return None
+
+    if not offset or not length or offset + length > len(data):
+        return None
+    return data[offset:offset + length]
+
+
+def load_embedded_thumbnail(file_path, min_size=0, target_size=0):
+    # Returns the thumbnail stored inside the file if its longer side is at least min_size, without
+    # decoding the primary image; None when the file has no usable embedded thumbnail.
+    # For pyramidal TIFFs the smallest level covering target_size is used.
+    with open_image(file_path) as img:
+        thumb = None
+        if img.format == "TIFF" and img.tag_v2.get(TIFF_TAG_SUBIFDS):
+            offsets = img.tag_v2[TIFF_TAG_SUBIFDS]
+            try:
+                # Levels are picked from their IFD headers; only the chosen level's tiles are read
+                prefix, levels = read_tiff_subifds(file_path, offsets if isinstance(offsets, tuple) else (offsets,))
+                levels.sort(key=lambda level: max(level[256], level[257]))
+                wanted = max(min_size, target_size)
+                best = next((level for level in levels if max(level[256], level[257]) >= wanted), levels[-1])
+                with open_tiff_subifd(file_path, prefix, best) as level:
+                    thumb = level.copy()
+            except Exception:
+                # An unreadable level only costs the early preview; callers fall back to the full decode
+                thumb = None
+        elif img.format == "JPEG" and img.info.get("exif"):
+            data = read_exif_thumbnail(img.info["exif"])
+            if data:
+                thumb = Image.open(io.BytesIO(data))
+        elif img.format in ("HEIF", "AVIF"):
+            import pillow_heif
+            heif_file = pillow_heif.open_heif(file_path)
+            heif_image = heif_file[heif_file.primary_index]
+            sizes = heif_image.info.get("thumbnails") or []
+            if sizes:
+                order = sorted(range(len(sizes)), key=lambda index: sizes[index])
+                wanted = max(min_size, target_size)
+                best = next((index for index in order if sizes[index] >= wanted), order[-1])
+                thumb = heif_image.get_thumbnail(best).to_pillow()
+
+        if thumb is None or max(thumb.size) < min_size:
+            return None
+
+        thumb.load()
+        # EXIF previews are stored unrotated like the main JPEG; Pillow orients TIFF levels itself on load
+        method = ORIENTATION_TRANSPOSES.get(img.getexif().get(EXIF_TAG_ORIENTATION, 1))
+        if img.format == "JPEG" and method is not None:
+            thumb = thumb.transpose(method)
+        return thumb
+
+
+def user_cache_dir():
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    path = os.path.join(base, "heicviewer")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def format_exif_value(value):
+    if isinstance(value, bytes):
+        return value.hex() if len(value) <= 64 else f"<{len(value)} bytes>"
+    return value
+
+
+def read_icc_summary(icc_profile):
+    # Device class and colour space live at fixed offsets of the 128-byte ICC header
+    if not icc_profile or len(icc_profile) < 128:
+        return None
+    return {
+        "size": len(icc_profile),
+        "device_class": icc_profile[12:16].decode("ascii", "replace").strip(),
+        "color_space": icc_profile[16:20].decode("ascii", "replace").strip(),
+        "version": f"{icc_profile[8]}.{icc_profile[9] >> 4}"
+    }
+
+
+def gps_to_decimal(gps_ifd):
+    def to_degrees(value):
+        degrees, minutes, seconds = (float(part) for part in value)
+        return degrees + minutes / 60 + seconds / 3600
+
+    gps = {}
+    try:
+        if 2 in gps_ifd and 4 in gps_ifd:
+            latitude = to_degrees(gps_ifd[2])
+            longitude = to_degrees(gps_ifd[4])
+            gps["gps_latitude"] = round(-latitude if gps_ifd.get(1) == "S" else latitude, 7)
+            gps["gps_longitude"] = round(-longitude if gps_ifd.get(3) == "W" else longitude, 7)
+        if 6 in gps_ifd:
+            altitude = float(gps_ifd[6])
+            gps["gps_altitude"] = round(-altitude if gps_ifd.get(5) in (1, b"\x01") else altitude, 2)
+    except (TypeError, ValueError, ZeroDivisionError):
+        pass
+    return gps
+
+
+def read_file_metadata(file_path):
+    # Image.open and getexif only parse the container headers; no pixel data is decoded.
+    with open_image(file_path) as img:
+        exif = img.getexif()
+        exif_ifd = exif.get_ifd(EXIF_IFD_POINTER) if exif else {}
+        gps_ifd = exif.get_ifd(EXIF_GPS_IFD_POINTER) if exif else {}
+
+        camera = " ".join(str(exif.get(tag, "")).strip("\x00 ") for tag in (EXIF_TAG_MAKE, EXIF_TAG_MODEL))
+        capture_date = exif_ifd.get(EXIF_TAG_DATETIME_ORIGINAL) or exif.get(EXIF_TAG_DATETIME)
+
+        tags = [(ExifTags.TAGS.get(tag_id, tag_id), format_exif_value(value))
+                for tag_id, value in exif.items() if tag_id not in (EXIF_IFD_POINTER, EXIF_GPS_IFD_POINTER)]
+        tags += [(ExifTags.TAGS.get(tag_id, tag_id), format_exif_value(value)) for tag_id, value in exif_ifd.items()]
+        tags += [(ExifTags.GPSTAGS.get(tag_id, tag_id), format_exif_value(value))
+                 for tag_id, value in gps_ifd.items()]
+
+        xmp = img.info.get("xmp")
+        if isinstance(xmp, bytes):
+            xmp = xmp.decode("utf-8", "replace")
+
+        return {
+            "width": img.width,
+            "height": img.height,
+            "format": img.format,
+            "mode": img.mode,
+            "frames": getattr(img, "n_frames", 1),
+            "capture_date": str(capture_date).strip("\x00 ") if capture_date else None,
+            "camera": camera.strip() or None,
+            "orientation": exif.get(EXIF_TAG_ORIENTATION, 1),
+            "exif": tags,
+            "gps": gps_to_decimal(gps_ifd),
+            "xmp": xmp.strip("\x00 ") if xmp else None,
+            "icc": read_icc_summary(img.info.get("icc_profile"))
+        }
+
+
+def read_header_metadata(file_path):
+    metadata = read_file_metadata(file_path)
+    return {key: metadata[key] for key in ("width", "height", "format", "capture_date", "camera", "orientation")}
+
+
+METADATA_EXPORT_FIELDS = ["path", "file_size", "mtime", "format", "width", "height", "capture_date", "camera",
+                          "orientation", "gps_latitude", "gps_longitude", "gps_altitude", "error"]
+
+
+def iter_image_files(root_dir):
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+
+def metadata_export_row(file_path):
+    row = {"path": file_path}
+    try:
+        stat = os.stat(file_path)
+        row["file_size"] = stat.st_size
+        row["mtime"] = datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds")
+
+        metadata = read_file_metadata(file_path)
+        for key in ("format", "width", "height", "capture_date", "camera", "orientation"):
+            row[key] = metadata[key]
+        row.update(metadata["gps"])
+        row["exif"] = {str(tag): str(value) for tag, value in metadata["exif"]}
+    except Exception as e:
+        row["error"] = str(e)
+    return row
+
+
+def export_directory_metadata(root_dir, output_path, output_format, workers, on_progress=None, cancel_event=None):
+    # Rows are written as soon as each file is parsed and at most workers * 4 files are in flight,
+    # so memory stays flat no matter how large the tree is.
+    counts = {"files": 0, "errors": 0}
+
+    with open(output_path, 'w', newline='', encoding='utf-8') as f:
+        writer = None
+        if output_format == "csv":
+            writer = csv.DictWriter(f, fieldnames=METADATA_EXPORT_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+
+        def write_rows(futures):
+            for future in futures:
+                row = future.result()
+                if writer:
+                    writer.writerow(row)
+                else:
+                    f.write(json.dumps(row, default=str) + "\n")
+
+                counts["files"] += 1
+                if "error" in row:
+                    counts["errors"] += 1
+            if on_progress:
+                on_progress(counts["files"], counts["errors"])
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            in_flight = set()
+            for file_path in iter_image_files(root_dir):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+
+                in_flight.add(executor.submit(metadata_export_row, file_path))
+                if len(in_flight) >= workers * 4:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    write_rows(done)
+
+            write_rows(in_flight)
+
+    return counts["files"], counts["errors"]
+
+
+def compute_histogram(img, proxy_size=256):
+    # Works on a downsampled proxy: a 48 MP frame reduces to roughly 256 px on the long side first
+    factor = max(1, max(img.size) // proxy_size)
+    proxy = img.reduce(factor) if factor > 1 else img
+    if proxy.mode != "RGB":
+        proxy = proxy.convert("RGB")
+
+    histogram = proxy.histogram()
+    pixel_count = proxy.width * proxy.height
+    channels = [histogram[i * 256:(i + 1) * 256] for i in range(3)]
+
+    return {
+        "channels": channels,
+        "shadows_clipped": max(channel[0] for channel in channels) / pixel_count,
+        "highlights_clipped": max(channel[255] for channel in channels) / pixel_count
+    }
+
+
+def blend_bands(band, base, factor):
+    # base + (band - base) * factor on float bands; Image.blend only accepts 8-bit modes
+    if hasattr(ImageMath, "lambda_eval"):
+        return ImageMath.lambda_eval(lambda args: args["base"] + (args["band"] - args["base"]) * factor,
+                                     band=band, base=base)
+    return ImageMath.eval("base + (band - base) * factor", band=band, base=base, factor=factor)
+
+
+class HighBitImage:
+    # Full-precision working copy of an HDR HEIF: one float band per channel on a 0-65535 scale.
+    # Pillow has no 16-bit colour mode, so this implements the part of the Image API the editor uses.
+    LUMA = (0.299, 0.587, 0.114)
+
+    def __init__(self, bands):
+        self.bands = bands
+
+    @classmethod
+    def from_interleaved(cls, mode, size, data, stride):
+        width, height = size
+        channels = 4 if mode.startswith("RGBA") else 3
+        row_bytes = width * channels * 2
+        data = bytes(data)
+        if stride != row_bytes:
+            data = b"".join(data[y * stride:y * stride + row_bytes] for y in range(height))
+
+        # Slicing 16-bit units keeps each sample's little-endian byte order intact
+        samples = array("H")
+        samples.frombytes(data)
+        return cls([Image.frombytes("I;16", size, samples[c::channels].tobytes()).convert("F")
+                    for c in range(channels)])
+
+    @property
+    def mode(self):
+        return "RGBA;16" if len(self.bands) == 4 else "RGB;16"
+
+    @property
+    def size(self):
+        return self.bands[0].size
+
+    @property
+    def width(self):
+        return self.bands[0].width
+
+    @property
+    def height(self):
+        return self.bands[0].height
+
+    def getbands(self):
+        return ("R", "G", "B", "A")[:len(self.bands)]
+
+    def copy(self):
+        return HighBitImage([band.copy() for band in self.bands])
+
+    def crop(self, box):
+        return HighBitImage([band.crop(box) for band in self.bands])
+
+    def resize(self, size, resample=Image.BICUBIC):
+        return HighBitImage([band.resize(size, resample) for band in self.bands])
+
+    def reduce(self, factor):
+        return HighBitImage([band.reduce(factor) for band in self.bands])
+
+    def rotate(self, angle, resample=Image.NEAREST, expand=False):
+        return HighBitImage([band.rotate(angle, resample, expand=expand) for band in self.bands])
+
+    def transpose(self, method):
+        return HighBitImage([band.transpose(method) for band in self.bands])
+
+    def filter(self, image_filter):
+        # Kernel filters run on "I" bands with the 8-bit offset rescaled; anything else falls back to 8-bit
+        if not hasattr(image_filter, "filterargs"):
+            return self.to_8bit().filter(image_filter)
+        size, scale, offset, kernel = image_filter.filterargs
+        kernel_filter = ImageFilter.Kernel(size, kernel, scale, offset * 257)
+        return HighBitImage([band.convert("I").filter(kernel_filter).convert("F") for band in self.bands])
+
+    def convert(self, mode):
+        return self.to_8bit().convert(mode)
+
+    def adjusted(self, brightness=1.0, contrast=1.0, sharpness=1.0):
+        # Same formulas and smoothing kernel as ImageEnhance, evaluated on the float bands without clipping
+        color = self.bands[:3]
+        alpha = self.bands[3:]
+
+        if brightness != 1.0:
+            color = [band.point(lambda x: x * brightness) for band in color]
+
+        if contrast != 1.0:
+            means = [band.resize((1, 1), Image.BOX).getpixel((0, 0)) for band in color]
+            mean = sum(weight * value for weight, value in zip(self.LUMA, means))
+            color = [band.point(lambda x: x * contrast + mean * (1 - contrast)) for band in color]
+
+        if sharpness != 1.0:
+            smoothed = HighBitImage(color).filter(ImageFilter.SMOOTH).bands
+            color = [blend_bands(band, base, sharpness) for band, base in zip(color, smoothed)]
+
+        return HighBitImage(color + alpha)
+
+    def to_8bit(self):
+        return Image.merge("RGBA" if len(self.bands) == 4 else "RGB",
+                           [band.point(lambda x: x / 257).convert("L") for band in self.bands])
+
+    def interleaved_bytes(self, big_endian):
+        # Rounds and clips each band to 0-65535, then interleaves the samples pixel by pixel
+        channels = len(self.bands)
+        samples = array("H", bytes(2 * self.width * self.height * channels))
+        for c, band in enumerate(self.bands):
+            plane = array("H")
+            plane.frombytes(band.point(lambda x: x + 0.5).convert("I").convert("I;16B" if big_endian else "I;16")
+                            .tobytes())
+            samples[c::channels] = plane
+        return samples.tobytes()
+
+    def save(self, fp, format=None, **params):
+        format_name = (format or os.path.splitext(fp)[1][1:]).upper()
+        if format_name == "PNG":
+            data = self.encode_png(params.get("compress_level", 6))
+        elif format_name in ("TIFF", "TIF"):
+            data = self.encode_tiff(params.get("compression"))
+        else:
+            self.to_8bit().save(fp, format=format, **params)
+            return
+
+        if isinstance(fp, str):
+            with open(fp, "wb") as f:
+                f.write(data)
+        else:
+            fp.write(data)
+
+    def encode_png(self, compress_level=6):
+        width, height = self.size
+        row_bytes = width * len(self.bands) * 2
+        pixels = self.interleaved_bytes(big_endian=True)
+        raw = b"".join(b"\x00" + pixels[y * row_bytes:(y + 1) * row_bytes] for y in range(height))
+
+        def chunk(tag, payload):
+            return struct.pack(">I", len(payload)) + tag + payload + struct.pack(">I", zlib.crc32(tag + payload))
+
+        color_type = 6 if len(self.bands) == 4 else 2
+        return (b"\x89PNG\r\n\x1a\n"
+                + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 16, color_type, 0, 0, 0))
+                + chunk(b"IDAT", zlib.compress(raw, compress_level))
+                + chunk(b"IEND", b""))
+
+    def encode_tiff(self, compression=None):
+        # Pillow cannot write 16-bit RGB TIFFs, so this writes a single-strip baseline file.
+        # The standard library has no LZW encoder, so any compressed preset uses Deflate.
+        width, height = self.size
+        channels = len(self.bands)
+        pixels = self.interleaved_bytes(big_endian=False)
+        if compression:
+            pixels = zlib.compress(pixels)
+
+        bits_offset = 8
+        strip_offset = bits_offset + 2 * channels
+        padding = b"\x00" * ((strip_offset + len(pixels)) % 2)
+        ifd_offset = strip_offset + len(pixels) + len(padding)
+
+        entries = [
+            (256, 4, 1, width),
+            (257, 4, 1, height),
+            (258, 3, channels, bits_offset),
+            (259, 3, 1, 8 if compression else 1),
+            (262, 3, 1, 2),
+            (273, 4, 1, strip_offset),
+            (277, 3, 1, channels),
+            (278, 4, 1, height),
+            (279, 4, 1, len(pixels)),
+            (284, 3, 1, 1),
+        ]
+        if channels == 4:
+            entries.append((338, 3, 1, 2))
+
+        ifd = struct.pack("<H", len(entries))
+        for tag, field_type, count, value in entries:
+            if field_type == 3 and count == 1:
+                ifd += struct.pack("<HHIHH", tag, field_type, count, value, 0)
+            else:
+                ifd += struct.pack("<HHII", tag, field_type, count, value)
+        ifd += struct.pack("<I", 0)
+
+        return (b"II*\x00" + struct.pack("<I", ifd_offset) + struct.pack("<" + "H" * channels, *[16] * channels)
+                + pixels + padding + ifd)
+
+
+TIFF_COMPRESSIONS = ("none", "deflate", "deflate+predictor")
+TIFF_TILE_SIZES = (256, 512, 1024)
+TIFF_TAG_SUBIFDS = 330
+TIFF_TAG_TILE_OFFSETS = 324
+TIFF_TAG_TILE_BYTE_COUNTS = 325
+TIFF_FIELD_FORMATS = {3: "H", 4: "I", 13: "I", 16: "Q", 18: "Q"}
+
+
+def tiff_tile_bytes(image, box, predictor=False):
+    # Edge tiles are cropped past the image border, which pads them to full size with zeros
+    tile = image.crop(box)
+    if isinstance(tile, HighBitImage):
+        return tile.interleaved_bytes(big_endian=False)
+    if predictor:
+        # TIFF predictor 2: each sample stores the difference to its left neighbour, modulo 256
+        shifted = Image.new(tile.mode, tile.size)
+        shifted.paste(tile.crop((0, 0, tile.width - 1, tile.height)), (1, 0))
+        tile = ImageChops.subtract_modulo(tile, shifted)
+    return tile.tobytes()
+
+
+def write_tiff_ifd(f, entries, big, next_ifd=0):
+    inline = 8 if big else 4
+    offset_format = "<Q" if big else "<I"
+    packed = []
+    for tag, field_type, values in sorted(entries):
+        data = struct.pack("<" + TIFF_FIELD_FORMATS[field_type] * len(values), *values)
+        if len(data) > inline:
+            f.write(b"\x00" * (f.tell() % 2))
+            array_offset = f.tell()
+            f.write(data)
+            data = struct.pack(offset_format, array_offset)
+        packed.append((tag, field_type, len(values), data.ljust(inline, b"\x00")))
+
+    f.write(b"\x00" * (f.tell() % 2))
+    ifd_offset = f.tell()
+    f.write(struct.pack("<Q" if big else "<H", len(packed)))
+    for tag, field_type, count, data in packed:
+        f.write(struct.pack("<HHQ" if big else "<HHI", tag, field_type, count) + data)
+    f.write(struct.pack(offset_format, next_ifd))
+    return ifd_offset
+
+
+def write_tiled_tiff(file_path, image, tile_size=256, compression="deflate", pyramid=True):
+    # Tiles are cropped, compressed and written one at a time, so encoder memory stays at one tile.
+    # Reduced-resolution levels (each half the previous) go into SubIFDs of the full-size image.
+    high_bit = isinstance(image, HighBitImage)
+    if not high_bit and image.mode not in ("L", "RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    channels = len(image.getbands())
+    bits = 16 if high_bit else 8
+    predictor = compression == "deflate+predictor" and not high_bit
+
+    # Classic TIFF offsets are 32-bit; BigTIFF takes over when the data could come near 4 GB
+    raw_bytes = image.width * image.height * channels * bits // 8
+    big = raw_bytes * 4 // 3 > 2 ** 32 - 2 ** 26
+    offset_type = 16 if big else 4
+
+    def write_tiles(f, level):
+        offsets, byte_counts = [], []
+        for y in range(0, level.height, tile_size):
+            for x in range(0, level.width, tile_size):
+                data = tiff_tile_bytes(level, (x, y, x + tile_size, y + tile_size), predictor)
+                if compression != "none":
+                    data = zlib.compress(data, 6)
+                offsets.append(f.tell())
+                byte_counts.append(len(data))
+                f.write(data)
+        return offsets, byte_counts
+
+    def level_entries(level, subfile_type, offsets, byte_counts):
+        entries = [
+            (254, 4, [subfile_type]),
+            (256, 4, [level.width]),
+            (257, 4, [level.height]),
+            (258, 3, [bits] * channels),
+            (259, 3, [1 if compression == "none" else 8]),
+            (262, 3, [1 if channels == 1 else 2]),
+            (277, 3, [channels]),
+            (284, 3, [1]),
+            (322, 4, [tile_size]),
+            (323, 4, [tile_size]),
+            (324, offset_type, offsets),
+            (325, offset_type, byte_counts),
+        ]
+        if predictor:
+            entries.append((317, 3, [2]))
+        if channels == 4:
+            entries.append((338, 3, [2]))
+        return entries
+
+    with open(file_path, "wb") as f:
+        f.write(b"II+\x00" + struct.pack("<HHQ", 8, 0, 0) if big else b"II*\x00" + struct.pack("<I", 0))
+        offsets, byte_counts = write_tiles(f, image)
+
+        sub_ifds = []
+        level = image
+        while pyramid and max(level.size) > tile_size:
+            level = level.reduce(2)
+            level_offsets, level_counts = write_tiles(f, level)
+            sub_ifds.append(write_tiff_ifd(f, level_entries(level, 1, level_offsets, level_counts), big))
+
+        entries = level_entries(image, 0, offsets, byte_counts)
+        if sub_ifds:
+            entries.append((TIFF_TAG_SUBIFDS, 18 if big else 13, sub_ifds))
+        first_ifd = write_tiff_ifd(f, entries, big)
+
+        f.seek(8 if big else 4)
+        f.write(struct.pack("<Q" if big else "<I", first_ifd))
+
+
+def read_tiff_subifds(file_path, ifd_offsets):
+    # Parses only the IFDs themselves, so choosing a level never touches tile data
+    with open(file_path, "rb") as f:
+        header = f.read(16)
+        levels = []
+        for ifd_offset in ifd_offsets:
+            level = TiffImagePlugin.ImageFileDirectory_v2(header if header[2] == 43 else header[:8])
+            f.seek(ifd_offset)
+            level.load(f)
+            levels.append(level)
+    return header[:2], levels
+
+
+def open_tiff_subifd(file_path, prefix, source):
+    # Pillow only walks the main IFD chain, so the level's IFD and tiles are copied into a small standalone
+    # TIFF that it can open. Only that level's bytes are read, never the full-resolution tiles.
+    offsets, counts = source[TIFF_TAG_TILE_OFFSETS], source[TIFF_TAG_TILE_BYTE_COUNTS]
+    offsets = offsets if isinstance(offsets, tuple) else (offsets,)
+    counts = counts if isinstance(counts, tuple) else (counts,)
+    tiles = []
+    with open(file_path, "rb") as f:
+        for offset, count in zip(offsets, counts):
+            f.seek(offset)
+            tiles.append(f.read(count))
+
+    endian = "<" if prefix == b"II" else ">"
+    level = TiffImagePlugin.ImageFileDirectory_v2(prefix=prefix)
+    for tag, value in source.items():
+        # BigTIFF's 64-bit LONG8/IFD8 types do not exist in a classic TIFF
+        level.tagtype[tag] = 4 if source.tagtype[tag] in (16, 18) else source.tagtype[tag]
+        level[tag] = value
+
+    positions = []
+    position = 8
+    for tile in tiles:
+        positions.append(position)
+        position += len(tile)
+    level.tagtype[TIFF_TAG_TILE_OFFSETS] = level.tagtype[TIFF_TAG_TILE_BYTE_COUNTS] = 4
+    level[TIFF_TAG_TILE_OFFSETS] = tuple(positions)
+    level[TIFF_TAG_TILE_BYTE_COUNTS] = tuple(len(tile) for tile in tiles)
+
+    data = prefix + struct.pack(endian + "HI", 42, position) + b"".join(tiles) + level.tobytes(position)
+    return Image.open(io.BytesIO(data))
+
+
+ORIENTATION_TRANSPOSES = {
+    1: None,
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90
+}
+LOSSLESS_OPERATIONS = {
+    "Rotate Left": Image.ROTATE_90,
+    "Rotate Right": Image.ROTATE_270,
+    "Rotate 180°": Image.ROTATE_180,
+    "Flip Horizontal": Image.FLIP_LEFT_RIGHT,
+    "Flip Vertical": Image.FLIP_TOP_BOTTOM
+}
+
+
+def transpose_chain(methods):
+    # Identifies a chain of transposes by what it does to a tiny probe image
+    probe = Image.frombytes("L", (3, 2), bytes(range(6)))
+    for method in methods:
+        if method is not None:
+            probe = probe.transpose(method)
+    return probe.size, probe.tobytes()
+
+
+def compose_orientation(orientation, method):
+    # EXIF orientation that displays the stored pixels as `orientation` followed by `method` would
+    target = transpose_chain([ORIENTATION_TRANSPOSES.get(orientation), method])
+    for candidate, candidate_method in ORIENTATION_TRANSPOSES.items():
+        if transpose_chain([candidate_method]) == target:
+            return candidate
+
+
+def replace_file(file_path, data):
+    directory, name = os.path.split(file_path)
+    temp_path = os.path.join(directory, f".{name}.{os.getpid()}.part")
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        shutil.copymode(file_path, temp_path)
+        os.replace(temp_path, file_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def find_jpeg_exif(data):
+    # (segment start, segment end, TIFF header start) of the APP1 Exif segment
+    pos = 2
+    while pos + 4 <= len(data) and data[pos] == 0xFF:
+        marker = data[pos + 1]
+        if marker == 0xDA:
+            break
+        length = struct.unpack_from(">H", data, pos + 2)[0]
+        if marker == 0xE1 and data[pos + 4:pos + 10] == b"Exif\x00\x00":
+            return pos, pos + 2 + length, pos + 10
+        pos += 2 + length
+    return None
+
+
+def exif_orientation_offset(data, tiff_start):
+    # File offset and byte order of the IFD0 Orientation value, or (None, order) when the tag is missing
+    endian = "<" if data[tiff_start:tiff_start + 2] == b"II" else ">"
+    if struct.unpack_from(endian + "H", data, tiff_start + 2)[0] != 42:
+        return None, endian
+    ifd0 = tiff_start + struct.unpack_from(endian + "I", data, tiff_start + 4)[0]
+    for i in range(struct.unpack_from(endian + "H", data, ifd0)[0]):
+        entry = ifd0 + 2 + i * 12
+        tag, field_type = struct.unpack_from(endian + "HH", data, entry)
+        if tag == EXIF_TAG_ORIENTATION and field_type == 3:
+            return entry + 8, endian
+    return None, endian
+
+
+def rotate_exif_file(file_path, method, file_format, base_orientation=None):
+    # Only the two bytes of the Orientation value are rewritten; the compressed pixels stay untouched.
+    # `base_orientation` replaces the stored value when the caller displayed the pixels differently.
+    with open(file_path, "rb") as f:
+        head = f.read(256 * 1024)
+
+    offset = None
+    try:
+        segment = (0, 0, 0) if file_format == "TIFF" else find_jpeg_exif(head)
+        if segment:
+            offset, endian = exif_orientation_offset(head, segment[2])
+    except struct.error:
+        offset = None
+
+    if offset is None:
+        if file_format != "JPEG":
+            raise ValueError("The file has no EXIF Orientation tag to update")
+        return insert_jpeg_orientation(file_path, method, base_orientation)
+
+    current = base_orientation or struct.unpack_from(endian + "H", head, offset)[0]
+    orientation = compose_orientation(current if current in ORIENTATION_TRANSPOSES else 1, method)
+    with open(file_path, "r+b") as f:
+        f.seek(offset)
+        f.write(struct.pack(endian + "H", orientation))
+    return orientation
+
+
+def insert_jpeg_orientation(file_path, method, base_orientation=None):
+    # No Orientation tag yet: splice a rebuilt Exif segment between the untouched JPEG segments
+    with open(file_path, "rb") as f:
+        data = f.read()
+    with Image.open(io.BytesIO(data)) as img:
+        exif = img.getexif()
+
+    current = base_orientation or exif.get(EXIF_TAG_ORIENTATION, 1)
+    orientation = compose_orientation(current if current in ORIENTATION_TRANSPOSES else 1, method)
+    exif[EXIF_TAG_ORIENTATION] = orientation
+    payload = exif.tobytes()
+    if len(payload) + 2 > 0xFFFF:
+        raise ValueError("The EXIF block is too large for a JPEG segment")
+    segment = b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+
+    existing = find_jpeg_exif(data)
+    if existing:
+        data = data[:existing[0]] + segment + data[existing[1]:]
+    else:
+        insert_at = 2
+        if data[2:4] == b"\xff\xe0":
+            # The JFIF APP0 segment has to stay first
+            insert_at = 4 + struct.unpack_from(">H", data, 4)[0]
+        data = data[:insert_at] + segment + data[insert_at:]
+
+    replace_file(file_path, data)
+    return orientation
+
+
+def iter_boxes(data, start, end):
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise ValueError("Corrupt HEIF box structure")
+        yield box_type, pos, header, size
+        pos += size
+
+
+def find_box(data, box, box_type, skip=0):
+    # `skip` jumps over the version/flags word of full boxes
+    start = box[1] + box[2] + skip
+    return next((child for child in iter_boxes(data, start, box[1] + box[3]) if child[0] == box_type), None)
+
+
+def read_uint(data, pos, size):
+    return int.from_bytes(data[pos:pos + size], "big")
+
+
+def parse_heif_layout(data):
+    top = (b"file", 0, 0, len(data))
+    meta = find_box(data, top, b"meta")
+    if meta is None:
+        raise ValueError("The file has no HEIF meta box")
+    pitm = find_box(data, meta, b"pitm", 4)
+    iprp = find_box(data, meta, b"iprp", 4)
+    iloc = find_box(data, meta, b"iloc", 4)
+    if pitm is None or iprp is None or iloc is None:
+        raise ValueError("The file has no primary image item")
+    ipco = find_box(data, iprp, b"ipco")
+    ipma = find_box(data, iprp, b"ipma")
+    if ipco is None or ipma is None:
+        raise ValueError("The file has no item properties")
+
+    primary = read_uint(data, pitm[1] + pitm[2] + 4, 4 if data[pitm[1] + pitm[2]] else 2)
+
+    version = data[ipma[1] + ipma[2]]
+    wide = data[ipma[1] + ipma[2] + 3] & 1
+    id_size = 4 if version else 2
+    index_size = 2 if wide else 1
+    index_mask = 0x7FFF if wide else 0x7F
+    associations = {}
+    pos = ipma[1] + ipma[2] + 8
+    for _ in range(read_uint(data, pos - 4, 4)):
+        item_id = read_uint(data, pos, id_size)
+        count_pos = pos + id_size
+        indices = [read_uint(data, count_pos + 1 + i * index_size, index_size) & index_mask
+                   for i in range(data[count_pos])]
+        associations[item_id] = (count_pos, indices)
+        pos = count_pos + 1 + len(indices) * index_size
+
+    thumbnails = []
+    iref = find_box(data, meta, b"iref", 4)
+    if iref is not None:
+        ref_id_size = 4 if data[iref[1] + iref[2]] else 2
+        for ref_type, ref_pos, ref_header, _ in iter_boxes(data, iref[1] + iref[2] + 4, iref[1] + iref[3]):
+            pos = ref_pos + ref_header
+            count = read_uint(data, pos + ref_id_size, 2)
+            targets = [read_uint(data, pos + ref_id_size + 2 + i * ref_id_size, ref_id_size) for i in range(count)]
+            if ref_type == b"thmb" and primary in targets:
+                thumbnails.append(read_uint(data, pos, ref_id_size))
+
+    properties = [None] + list(iter_boxes(data, ipco[1] + ipco[2], ipco[1] + ipco[3]))
+    return {
+        "meta": meta, "iprp": iprp, "ipco": ipco, "ipma": ipma, "iloc": iloc, "primary": primary,
+        "thumbnails": thumbnails, "associations": associations, "properties": properties,
+        "index_size": index_size, "index_mask": index_mask
+    }
+
+
+def heif_transform_methods(box_type, value):
+    # irot turns anticlockwise in quarter turns; libheif flips imir axis 0 top-to-bottom and axis 1 left-to-right
+    if box_type == b"irot":
+        return [Image.ROTATE_90] * (value & 3)
+    return [Image.FLIP_TOP_BOTTOM if value & 1 == 0 else Image.FLIP_LEFT_RIGHT]
+
+
+def solve_heif_transforms(box_types, target, fixed=()):
+    # Values for a sequence of irot/imir boxes that together produce the target; `fixed` pins the leading values
+    def search(values, methods):
+        index = len(values)
+        if index == len(box_types):
+            return values if transpose_chain(methods) == target else None
+        for value in ([fixed[index]] if index < len(fixed) else range(4 if box_types[index] == b"irot" else 2)):
+            found = search(values + [value], methods + heif_transform_methods(box_types[index], value))
+            if found is not None:
+                return found
+        return None
+    return search([], [])
+
+
+def shift_iloc_offsets(data, iloc, threshold, delta):
+    # Moves construction_method 0 extents that start at or after `threshold` by `delta` bytes
+    pos = iloc[1] + iloc[2]
+    version = data[pos]
+    offset_size, length_size = data[pos + 4] >> 4, data[pos + 4] & 15
+    base_offset_size, index_size = data[pos + 5] >> 4, data[pos + 5] & 15 if version else 0
+    pos += 6
+    item_count = read_uint(data, pos, 4 if version == 2 else 2)
+    pos += 4 if version == 2 else 2
+    patches = []
+    for _ in range(item_count):
+        pos += 4 if version == 2 else 2
+        method = 0
+        if version:
+            method = read_uint(data, pos, 2) & 15
+            pos += 2
+        pos += 2
+        base_pos = pos
+        base_offset = read_uint(data, pos, base_offset_size)
+        pos += base_offset_size
+        extent_count = read_uint(data, pos, 2)
+        pos += 2
+        extents = []
+        for _ in range(extent_count):
+            pos += index_size
+            extents.append((pos, read_uint(data, pos, offset_size)))
+            pos += offset_size + length_size
+        if method != 0:
+            continue
+        if base_offset_size and base_offset >= threshold:
+            patches.append((base_pos, base_offset_size, base_offset + delta))
+            continue
+        for extent_pos, extent_offset in extents:
+            if base_offset + extent_offset >= threshold:
+                if not offset_size:
+                    raise ValueError("The item locations cannot be moved")
+                patches.append((extent_pos, offset_size, extent_offset + delta))
+    for patch_pos, size, value in patches:
+        if value >= 1 << (8 * size):
+            raise ValueError("The item locations cannot be moved")
+        data[patch_pos:patch_pos + size] = value.to_bytes(size, "big")
+
+
+def rotate_heif_file(file_path, method):
+    # Rewrites the primary image's irot/imir properties; the coded image data is never decoded
+    with open(file_path, "rb") as f:
+        data = bytearray(f.read())
+    layout = parse_heif_layout(data)
+    properties, associations = layout["properties"], layout["associations"]
+    primary, index_size = layout["primary"], layout["index_size"]
+    if primary not in associations:
+        raise ValueError("The primary image has no properties")
+
+    def transforms(item_id):
+        return [index for index in associations[item_id][1]
+                if index < len(properties) and properties[index] and properties[index][0] in (b"irot", b"imir")]
+
+    current = transforms(primary)
+    items = [primary] + [item for item in layout["thumbnails"] if item in associations and transforms(item) == current]
+    current_types = [properties[index][0] for index in current]
+    current_values = [data[properties[index][1] + properties[index][2]] for index in current]
+    methods = [transform for box_type, value in zip(current_types, current_values)
+               for transform in heif_transform_methods(box_type, value)]
+    target = transpose_chain(methods + [method])
+
+    # Existing boxes can be rewritten in place when nothing but this image and its thumbnails uses them
+    shared = any(set(indices) & set(current) for item, (_, indices) in associations.items() if item not in items)
+    values = None if shared else solve_heif_transforms(current_types, target)
+    if values is not None:
+        with open(file_path, "r+b") as f:
+            for index, value in zip(current, values):
+                f.seek(properties[index][1] + properties[index][2])
+                f.write(bytes([value]))
+        return
+
+    # Otherwise the image is re-associated with fresh boxes; decoders honour one irot and one imir per image
+    if find_box(data, (b"file", 0, 0, len(data)), b"moov") is not None:
+        raise ValueError("Image sequences cannot be rotated losslessly")
+    add_types = next(types for types in ([], [b"irot"], [b"imir"], [b"irot", b"imir"])
+                     if solve_heif_transforms(types, target) is not None)
+    add_values = solve_heif_transforms(add_types, target)
+    first_index = len(properties)
+    if first_index + len(add_types) - 1 > layout["index_mask"]:
+        raise ValueError("The file has too many item properties")
+
+    new_boxes = b"".join(struct.pack(">I4sB", 9, box_type, value) for box_type, value in zip(add_types, add_values))
+    edits = [(layout["ipco"][1] + layout["ipco"][3], 0, new_boxes)]
+    ipma_growth = 0
+    for item in items:
+        count_pos, indices = associations[item]
+        entry_end = count_pos + 1 + len(indices) * index_size
+        kept = [data[count_pos + 1 + i * index_size:count_pos + 1 + (i + 1) * index_size]
+                for i, index in enumerate(indices) if index not in current]
+        if current and any(properties[index][0] == b"clap" for index in indices[indices.index(current[0]):]):
+            raise ValueError("The image is cropped after being rotated")
+        # Transformative properties are essential, so their indices carry the high bit
+        added = [(0x80 << (8 * index_size - 8) | (first_index + i)).to_bytes(index_size, "big")
+                 for i in range(len(add_types))]
+        entry = bytes([len(kept) + len(added)]) + b"".join(kept + added)
+        if len(kept) + len(added) > 255:
+            raise ValueError("The image has too many properties")
+        edits.append((count_pos, entry_end - count_pos, entry))
+        ipma_growth += len(entry) - (entry_end - count_pos)
+
+    total = len(new_boxes) + ipma_growth
+    for box, growth in ((layout["meta"], total), (layout["iprp"], total), (layout["ipco"], len(new_boxes)),
+                        (layout["ipma"], ipma_growth)):
+        if box[2] == 16:
+            struct.pack_into(">Q", data, box[1] + 8, box[3] + growth)
+        elif box[3] + growth < 1 << 32:
+            struct.pack_into(">I", data, box[1], box[3] + growth)
+        else:
+            raise ValueError("The HEIF meta box is too large")
+
+    shift_iloc_offsets(data, layout["iloc"], layout["iprp"][1] + layout["iprp"][3], total)
+    for pos, length, payload in sorted(edits, reverse=True):
+        data[pos:pos + length] = payload
+    replace_file(file_path, bytes(data))
+
+
+def rotate_file_losslessly(file_path, method, base_orientation=None):
+    # Returns the new EXIF orientation, or None for HEIF where decoders always apply irot/imir
+    file_format = EXTENSION_FORMATS.get(os.path.splitext(file_path)[1].lower())
+    if file_format == "HEIF":
+        rotate_heif_file(file_path, method)
+        return None
+    if file_format in ("JPEG", "TIFF"):
+        return rotate_exif_file(file_path, method, file_format, base_orientation)
+    raise ValueError("Lossless rotation supports JPEG, TIFF and HEIF files")
+
+
+class MetadataService:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, file_path):
+        stat = os.stat(file_path)
+        key = (file_path, stat.st_mtime_ns)
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+
+        metadata = read_file_metadata(file_path)
+        metadata["file_size"] = stat.st_size
+        metadata["mtime"] = stat.st_mtime
+
+        with self.lock:
+            self.entries[key] = metadata
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return metadata
+
+
+class ImageCache:
+    # Decoded images keyed by (path, mtime_ns, frame), evicted least recently used once max_bytes is exceeded.
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = Lock()
+
+    @staticmethod
+    def image_bytes(img):
+        if isinstance(img, HighBitImage):
+            return img.width * img.height * len(img.bands) * 4
+        bytes_per_band = 2 if "16" in img.mode else 4 if img.mode in ("I", "F") else 1
+        return img.width * img.height * len(img.getbands()) * bytes_per_band
+
+    def get(self, key):
+        with self.lock:
+            img = self.entries.get(key)
+            if img is not None:
+                self.entries.move_to_end(key)
+            return img
+
+    def put(self, key, img):
+        size = self.image_bytes(img)
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.image_bytes(self.entries.pop(key))
+            self.entries[key] = img
+            self.size += size
+            self.evict()
+
+    def set_limit(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            self.evict()
+
+    def evict(self):
+        while self.size > self.max_bytes and self.entries:
+            _, old = self.entries.popitem(last=False)
+            self.size -= self.image_bytes(old)
+
+
+class DirectoryIndex:
+    COLUMNS = ("path", "directory", "mtime", "size", "width", "height", "format", "capture_date", "camera",
+               "orientation")
+
+    def __init__(self, db_path):
+        self.lock = Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS images ("
+                "path TEXT PRIMARY KEY, directory TEXT, mtime REAL, size INTEGER, width INTEGER, height INTEGER, "
+                "format TEXT, capture_date TEXT, camera TEXT, orientation INTEGER)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS images_directory ON images (directory)")
+
+    def directory_entries(self, directory):
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM images WHERE directory = ?", (directory,)).fetchall()
+        return {row[0]: dict(zip(self.COLUMNS, row)) for row in rows}
+
+    def refresh_directory(self, directory, cancel_event=None, batch_size=200):
+        # Only files whose mtime or size changed since the last visit are re-read
+        known = self.directory_entries(directory)
+        pending = []
+        seen = set()
+
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if cancel_event is not None and cancel_event.is_set():
+                    # Rows already read are still valid, so a cancelled scan keeps them for the next visit
+                    self.store(pending)
+                    return known
+                if not entry.name.lower().endswith(IMAGE_EXTENSIONS) or not entry.is_file():
+                    continue
+
+                seen.add(entry.path)
+                stat = entry.stat()
+                row = known.get(entry.path)
+                if row and row["mtime"] == stat.st_mtime and row["size"] == stat.st_size:
+                    continue
+
+                row = self.read_row(entry.path, stat)
+                known[entry.path] = row
+                pending.append(row)
+                if len(pending) >= batch_size:
+                    self.store(pending)
+                    pending = []
+
+        self.store(pending)
+
+        removed = [path for path in known if path not in seen]
+        for path in removed:
+            del known[path]
+        self.remove_files(removed)
+
+        return known
+
+    def refresh_files(self, file_paths):
+        rows = {}
+        for file_path in file_paths:
+            try:
+                rows[file_path] = self.read_row(file_path, os.stat(file_path))
+            except OSError:
+                continue
+        self.store(list(rows.values()))
+        return rows
+
+    def remove_files(self, file_paths):
+        if not file_paths:
+            return
+        with self.lock, self.connection:
+            self.connection.executemany("DELETE FROM images WHERE path = ?", [(path,) for path in file_paths])
+
+    def read_row(self, file_path, stat):
+        row = {"path": file_path, "directory": os.path.dirname(file_path), "mtime": stat.st_mtime,
+               "size": stat.st_size}
+        try:
+            row.update(read_header_metadata(file_path))
+        except Exception:
+            row.update({"width": None, "height": None, "format": None, "capture_date": None,
+                        "camera": None, "orientation": None})
+        return row
+
+    def store(self, rows):
+        if not rows:
+            return
+        with self.lock, self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO images ({', '.join(self.COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in self.COLUMNS)})",
+                [tuple(row[column] for column in self.COLUMNS) for row in rows])
+
+
+class DirectoryWatcher:
+    # Emits ("added", path), ("removed", path) and ("renamed", old, new) events for image files;
+    # a file rewritten in place is reported as "added" again.
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_ISDIR = 0x40000000
+
+    POLL_INTERVAL = 2.0
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.events = queue.Queue()
+        self.stop_event = Event()
+        # Set once changes are being tracked, so a listing taken afterwards cannot miss anything
+        self.ready = Event()
+        self.moved_from = {}
+        self.thread = Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def is_alive(self):
+        return self.thread.is_alive()
+
+    def emit(self, kind, *paths):
+        is_image = [path.lower().endswith(IMAGE_EXTENSIONS) for path in paths]
+        if kind == "renamed" and is_image != [True, True]:
+            if is_image[0]:
+                self.events.put(("removed", paths[0]))
+            if is_image[1]:
+                self.events.put(("added", paths[1]))
+        elif all(is_image):
+            self.events.put((kind,) + paths)
+
+    def run(self):
+        if sys.platform.startswith("linux"):
+            try:
+                self.watch_inotify()
+                return
+            except (OSError, AttributeError):
+                pass
+        self.watch_polling()
+
+    def watch_inotify(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        try:
+            mask = self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+            if libc.inotify_add_watch(fd, os.fsencode(self.directory), mask) < 0:
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+            self.ready.set()
+
+            while not self.stop_event.is_set():
+                readable, _, _ = select.select([fd], [], [], 0.5)
+                if readable:
+                    self.handle_inotify_events(os.read(fd, 64 * 1024))
+                else:
+                    self.flush_moves()
+        finally:
+            os.close(fd)
+
+    def handle_inotify_events(self, data):
+        # The two halves of a rename can arrive in separate reads, so an unmatched MOVED_FROM is held
+        # until the next read (or an idle poll) before it counts as moved out of the directory
+        stale = set(self.moved_from)
+        offset = 0
+        while offset < len(data):
+            _, mask, cookie, length = struct.unpack_from("iIII", data, offset)
+            name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+            offset += 16 + length
+
+            if mask & self.IN_ISDIR or not name:
+                continue
+
+            path = os.path.join(self.directory, os.fsdecode(name))
+            if mask & self.IN_MOVED_FROM:
+                self.moved_from[cookie] = path
+            elif mask & self.IN_MOVED_TO and cookie in self.moved_from:
+                self.emit("renamed", self.moved_from.pop(cookie), path)
+            elif mask & (self.IN_CREATE | self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                self.emit("added", path)
+            elif mask & self.IN_DELETE:
+                self.emit("removed", path)
+
+        self.flush_moves(stale)
+
+    def flush_moves(self, cookies=None):
+        # Moved out of the watched directory
+        for cookie in list(self.moved_from if cookies is None else cookies):
+            path = self.moved_from.pop(cookie, None)
+            if path:
+                self.emit("removed", path)
+
+    def list_images(self):
+        current = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    current[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return current
+
+    def watch_polling(self):
+        # Files are compared by (mtime, size): rewriting a file in place does not touch the directory mtime
+        known = None
+        timeout = 0
+        while not self.stop_event.wait(timeout):
+            # Only the first listing is immediate; a failing listing must not turn into a busy loop
+            timeout = self.POLL_INTERVAL
+            try:
+                current = self.list_images()
+            except OSError:
+                continue
+
+            if known is not None:
+                for path in sorted(current):
+                    if known.get(path) != current[path]:
+                        self.emit("added", path)
+                for path in sorted(known.keys() - current.keys()):
+                    self.emit("removed", path)
+            known = current
+            self.ready.set()
+
+
+def instance_socket_path():
+    base = os.environ.get("XDG_RUNTIME_DIR") or user_cache_dir()
+    return os.path.join(base, "heicviewer.sock")
+
+
+def forward_to_running_instance(file_path, timeout=2.0):
+    if not hasattr(socket, "AF_UNIX"):
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(instance_socket_path())
+            client.sendall(os.path.abspath(file_path).encode("utf-8") + b"\n")
+            return client.recv(16).startswith(b"ok")
+    except OSError:
+        return False
+
+
+class InstanceServer:
+    # Each connection from a later launch sends one UTF-8 file path terminated by a newline and gets "ok" back.
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.requests = queue.Queue()
+        self.stop_event = Event()
+        self.server = None
+        self.thread = Thread(target=self.run, daemon=True)
+
+    def start(self):
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            try:
+                server.bind(self.socket_path)
+            except OSError:
+                # A socket file nobody answers on is left over from an instance that did not shut down cleanly
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    probe.settimeout(0.5)
+                    if probe.connect_ex(self.socket_path) == 0:
+                        raise
+                os.unlink(self.socket_path)
+                server.bind(self.socket_path)
+            os.chmod(self.socket_path, 0o600)
+            server.listen(8)
+        except OSError:
+            server.close()
+            raise
+
+        self.server = server
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.server:
+            self.server.close()
+            self.server = None
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+    def is_alive(self):
+        return self.thread.is_alive()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                readable, _, _ = select.select([self.server], [], [], 0.5)
+                if not readable:
+                    continue
+                connection, _ = self.server.accept()
+            except (OSError, ValueError, AttributeError):
+                if self.stop_event.is_set():
+                    break
+                continue
+
+            with connection:
+                try:
+                    connection.settimeout(2.0)
+                    data = b""
+                    while not data.endswith(b"\n") and len(data) < 64 * 1024:
+                        chunk = connection.recv(4096)
+                        if not chunk:
+                            break
+                        data += chunk
+                    path = data.decode("utf-8").strip()
+                    if path:
+                        self.requests.put(path)
+                    connection.sendall(b"ok\n")
+                except (OSError, UnicodeDecodeError):
+                    pass
+
+
+class ThumbnailCache:
+    def __init__(self, root_dir, thumb_size=160, max_bytes=512 * 1024 * 1024):
+        self.root_dir = root_dir
+        self.thumb_size = thumb_size
+        self.max_bytes = max_bytes
+        self.lock = Lock()
+        self.writes_since_cleanup = 0
+
+    def cache_path(self, file_path, stat):
+        key = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}|{self.thumb_size}|oriented"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        # Two levels of sharding keeps every directory small even with hundreds of thousands of entries
+        return os.path.join(self.root_dir, digest[:2], digest[2:4], f"{digest}.jpg")
+
+    def load(self, file_path):
+        cached = self.cache_path(file_path, os.stat(file_path))
+        try:
+            img = Image.open(cached)
+            img.load()
+            os.utime(cached)  # mtime doubles as last-access time for LRU cleanup
+            return img
+        except OSError:
+            pass
+
+        img = self.generate(file_path)
+        self.store(cached, img)
+        return img
+
+    def generate(self, file_path):
+        try:
+            embedded = load_embedded_thumbnail(file_path, self.thumb_size)
+        except Exception:
+            # A damaged embedded preview must not hide the thumbnail; the full decode below still works
+            embedded = None
+        if embedded:
+            embedded.thumbnail((self.thumb_size, self.thumb_size), Image.LANCZOS)
+            return embedded.convert("RGB")
+
+        with open_image(file_path) as img:
+            # JPEG decoders can scale by 1/2..1/8 during decode; other formats ignore this
+            img.draft("RGB", (self.thumb_size, self.thumb_size))
+            img.thumbnail((self.thumb_size, self.thumb_size), Image.LANCZOS)
+            return apply_exif_orientation(img).convert("RGB")
+
+    def store(self, cached, img):
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        temp_path = f"{cached}.{os.getpid()}.{get_ident()}.tmp"
+        img.save(temp_path, format="JPEG", quality=85)
+        os.replace(temp_path, cached)
+
+        with self.lock:
+            self.writes_since_cleanup += 1
+            due = self.writes_since_cleanup >= 200
+            if due:
+                self.writes_since_cleanup = 0
+        if due:
+            self.cleanup()
+
+    def cleanup(self):
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root_dir):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        # Evict least recently used until comfortably under the cap
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class ThumbnailBrowser:
+    # Only the rows in view exist as canvas items; they are recycled while scrolling, so a folder
+    # of 50k images costs the same number of items and PhotoImages as a folder of 50.
+    CELL_WIDTH = 180
+    CELL_HEIGHT = 200
+    PREFETCH_ROWS = 2
+    PHOTO_CACHE_SIZE = 500
+
+    def __init__(self, app, file_paths):
+        self.app = app
+        self.file_paths = list(file_paths)
+        self.index_of = {file_path: index for index, file_path in enumerate(self.file_paths)}
+        self.columns = 0
+        self.cells = {}
+        self.free_cells = []
+        self.photos = OrderedDict()
+        self.pending = {}
+        self.failed = set()
+        self.wanted = []
+        self.max_in_flight = max(1, app.batch_workers.get())
+        self.results = queue.Queue()
+        self.refresh_scheduled = False
+        self.closed = False
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title(f"Thumbnails - {len(self.file_paths)} images")
+        self.window.geometry("820x600")
+        self.window.configure(bg=app.get_theme_color("bg"))
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.canvas = Canvas(self.window, bg=app.get_theme_color("canvas_bg"), bd=0, highlightthickness=0)
+        self.scrollbar = Scrollbar(self.window, orient='vertical', command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self.on_scroll)
+
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.canvas.bind("<Configure>", lambda e: self.layout())
+        self.canvas.bind("<ButtonPress-1>", self.on_click)
+        self.canvas.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(int(-1 * (e.delta / 120)), "units"))
+
+        self.window.after(50, self.poll_results)
+
+    def layout(self):
+        columns = max(1, self.canvas.winfo_width() // self.CELL_WIDTH)
+        if columns != self.columns:
+            self.columns = columns
+            for index in list(self.cells):
+                self.recycle_cell(index)
+
+            rows = math.ceil(len(self.file_paths) / columns)
+            self.canvas.config(scrollregion=(0, 0, columns * self.CELL_WIDTH, rows * self.CELL_HEIGHT))
+
+        self.schedule_refresh()
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.schedule_refresh()
+
+    def schedule_refresh(self):
+        if not self.refresh_scheduled:
+            self.refresh_scheduled = True
+            self.window.after_idle(self.refresh_visible)
+
+    def refresh_visible(self):
+        self.refresh_scheduled = False
+        if self.closed or not self.columns:
+            return
+
+        total_rows = math.ceil(len(self.file_paths) / self.columns)
+        top = self.canvas.canvasy(0)
+        first_row = max(0, int(top // self.CELL_HEIGHT))
+        last_row = min(total_rows - 1, int((top + self.canvas.winfo_height()) // self.CELL_HEIGHT))
+
+        visible = range(first_row * self.columns, min(len(self.file_paths), (last_row + 1) * self.columns))
+
+        for index in list(self.cells):
+            if index not in visible:
+                self.recycle_cell(index)
+        for index in visible:
+            if index not in self.cells:
+                self.materialize_cell(index)
+
+        # Visible cells first (top to bottom), then the rows just below and just above the view
+        below = range(visible.stop, min(len(self.file_paths), visible.stop + self.PREFETCH_ROWS * self.columns))
+        above = range(max(0, visible.start - self.PREFETCH_ROWS * self.columns), visible.start)
+        self.wanted = [self.file_paths[index] for index in list(visible) + list(below) + list(reversed(above))
+                       if self.file_paths[index] not in self.photos and self.file_paths[index] not in self.failed]
+
+        # Requests that scrolled out of range and have not started yet are dropped
+        wanted = set(self.wanted)
+        for file_path, future in list(self.pending.items()):
+            if file_path not in wanted and future.cancel():
+                del self.pending[file_path]
+
+        self.pump_requests()
+
+    def pump_requests(self):
+        for file_path in self.wanted:
+            if len(self.pending) >= self.max_in_flight:
+                break
+            if file_path in self.pending or file_path in self.photos or file_path in self.failed:
+                continue
+            self.pending[file_path] = self.app.thumbnail_executor.submit(self.load_thumbnail, file_path)
+
+    def materialize_cell(self, index):
+        if self.free_cells:
+            items = self.free_cells.pop()
+        else:
+            items = (
+                self.canvas.create_rectangle(0, 0, 0, 0, fill=self.app.get_theme_color("button_bg"), outline=""),
+                self.canvas.create_image(0, 0, anchor='center'),
+                self.canvas.create_text(0, 0, fill=self.app.get_theme_color("text"), font=('Helvetica', 9))
+            )
+
+        rect_item, image_item, text_item = items
+        row, column = divmod(index, self.columns)
+        x = column * self.CELL_WIDTH + self.CELL_WIDTH // 2
+        y = row * self.CELL_HEIGHT + 90
+
+        file_path = self.file_paths[index]
+        name = os.path.basename(file_path)
+        if len(name) > 24:
+            name = name[:21] + "..."
+
+        self.canvas.coords(rect_item, x - 80, y - 80, x + 80, y + 80)
+        self.canvas.coords(image_item, x, y)
+        self.canvas.coords(text_item, x, y + 95)
+        self.canvas.itemconfig(text_item, text=name)
+
+        if file_path in self.photos:
+            self.photos.move_to_end(file_path)
+            self.canvas.itemconfig(image_item, image=self.photos[file_path])
+        else:
+            self.canvas.itemconfig(image_item, image="")
+
+        for item in items:
+            self.canvas.itemconfig(item, state='normal')
+        self.cells[index] = items
+
+    def recycle_cell(self, index):
+        items = self.cells.pop(index)
+        self.canvas.itemconfig(items[1], image="")
+        for item in items:
+            self.canvas.itemconfig(item, state='hidden')
+        self.free_cells.append(items)
+
+    def load_thumbnail(self, file_path):
+        if self.closed:
+            return
+        try:
+            self.results.put((file_path, self.app.thumbnail_cache.load(file_path)))
+        except Exception:
+            self.results.put((file_path, None))
 
-register_heif_opener()
+    def poll_results(self):
+        if self.closed:
+            return
+
+        # Bound the PhotoImage work per tick so scrolling stays smooth while thumbnails stream in
+        for _ in range(50):
+            try:
+                file_path, img = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            self.pending.pop(file_path, None)
+            if img is None:
+                self.failed.add(file_path)
+                continue
+
+            self.photos[file_path] = ImageTk.PhotoImage(img)
+            index = self.index_of[file_path]
+            if index in self.cells:
+                self.canvas.itemconfig(self.cells[index][1], image=self.photos[file_path])
+
+        self.evict_photos()
+        self.pump_requests()
+        self.window.after(50, self.poll_results)
+
+    def evict_photos(self):
+        visible = {self.file_paths[index] for index in self.cells}
+        for file_path in list(self.photos):
+            if len(self.photos) <= self.PHOTO_CACHE_SIZE:
+                break
+            if file_path not in visible:
+                del self.photos[file_path]
+
+    def on_click(self, event):
+        column = int(self.canvas.canvasx(event.x) // self.CELL_WIDTH)
+        row = int(self.canvas.canvasy(event.y) // self.CELL_HEIGHT)
+        index = row * self.columns + column
+
+        if 0 <= column < self.columns and 0 <= index < len(self.file_paths):
+            self.app.open_image_file(self.file_paths[index])
+
+    def close(self):
+        self.closed = True
+        for future in self.pending.values():
+            future.cancel()
+        self.window.destroy()
 
 
 def main():
+    parser = argparse.ArgumentParser(description="HEIC Viewer and Converter")
+    parser.add_argument("file", nargs="?", help="image file to open")
+    parser.add_argument("--benchmark", nargs="+", metavar="IMAGE",
+                        help="encode the sample images under each encoder preset and print time vs. size")
+    parser.add_argument("--export-metadata", metavar="DIR",
+                        help="export EXIF metadata for every image under DIR and exit")
+    parser.add_argument("--output", metavar="FILE", help="output file for --export-metadata")
+    parser.add_argument("--format", choices=["csv", "jsonl"],
+                        help="output format for --export-metadata (default: from the output extension)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print time to first paint and time until the image is shown")
+    parser.add_argument("--new-instance", action="store_true",
+                        help="open a separate window instead of handing the file to a running viewer")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(format_benchmark_table(run_encoder_benchmark(args.benchmark), len(args.benchmark)))
+        return
+
+    if args.export_metadata:
+        output_format = args.format or ("jsonl" if args.output and args.output.endswith(".jsonl") else "csv")
+        output_path = args.output or f"metadata.{output_format}"
+
+        def report(files, errors):
+            print(f"\r{files} files exported ({errors} errors)", end="", file=sys.stderr)
+
+        start = time.monotonic()
+        files, errors = export_directory_metadata(args.export_metadata, output_path, output_format,
+                                                  os.cpu_count() or 1, report)
+        print(f"\nWrote {files} rows to {output_path} in {time.monotonic() - start:.1f} s", file=sys.stderr)
+        return
+
+    # Hand the file to an already running viewer, which opens it with its caches already warm
+    if args.file and os.path.isfile(args.file) and not args.new_instance and forward_to_running_instance(args.file):
+        return
+
     root = tk.Tk()
     root.geometry("1200x800")
     root.minsize(800, 600)
 
-    app = HEICViewerApp(root)
+    app = HEICViewerApp(root, profile_startup=args.profile_startup)
+    if not args.new_instance:
+        app.start_instance_server()
 
     # Check if a file was passed as a command line argument
-    if len(sys.argv) > 1 and os.path.isfile(sys.argv[1]):
-        app.open_image_file(sys.argv[1])
+    if args.file and os.path.isfile(args.file):
+        app.open_image_file(args.file)
 
     root.mainloop()
 
 
 class HEICViewerApp:
-    def __init__(self, root):
+    def __init__(self, root, profile_startup=False):
         self.root = root
         self.root.title("HEIC Viewer and Converter")
+        self.profile_startup = profile_startup
         self.setup_variables()
         self.setup_ui()
         self.create_menu()
@@ -41,6 +2144,51 @@ class HEICViewerApp:
         self.load_settings()
         self.update_theme()
         self.update_recent_files_menu()
+        self.canvas.bind("<Expose>", self.on_first_paint, add="+")
+        self.open_caches()
+
+    def open_caches(self):
+        # Opening the SQLite index and creating the cache directories can touch a slow disk, so it never
+        # runs on the Tk thread during start-up
+        result = {}
+
+        def open_all():
+            try:
+                result["index"] = DirectoryIndex(os.path.join(user_cache_dir(), "index.sqlite3"))
+            except Exception:
+                pass
+            try:
+                result["thumbnails"] = ThumbnailCache(os.path.join(user_cache_dir(), "thumbnails"))
+            except Exception:
+                pass
+
+        def check_finished():
+            if worker.is_alive():
+                self.root.after(self.progress_poll_interval, check_finished)
+                return
+
+            self.directory_index = result.get("index")
+            self.thumbnail_cache = result.get("thumbnails")
+            self.report_startup("caches opened")
+            # A folder opened before the index was ready gets its scan now
+            if self.current_directory and self.index_scan_state is None:
+                self.start_index_scan(self.current_directory)
+
+        worker = Thread(target=open_all, daemon=True)
+        worker.start()
+        self.root.after(self.progress_poll_interval, check_finished)
+
+    def on_first_paint(self, event=None):
+        if self.first_paint_done:
+            return
+        self.first_paint_done = True
+        self.report_startup("first paint")
+        self.root.after_idle(self.build_sidebar_tools)
+
+    def report_startup(self, milestone):
+        if self.profile_startup and milestone not in self.startup_milestones:
+            self.startup_milestones.add(milestone)
+            print(f"startup: {milestone} after {(time.monotonic() - STARTUP_TIME) * 1000:.0f} ms", file=sys.stderr)
 
     def setup_variables(self):
         self.heic_image = None
@@ -53,6 +2201,8 @@ class HEICViewerApp:
         self.edit_history = []
         self.edit_position = -1
         self.edit_limit = 20
+        self.net_orientation = 1
+        self.applied_orientation = None
         self.is_dark_mode = BooleanVar(value=True)
         self.show_info = BooleanVar(value=True)
         self.quality_value = IntVar(value=90)
@@ -60,9 +2210,21 @@ class HEICViewerApp:
         self.max_recent_files = 10
         self.is_slideshow_active = False
         self.slideshow_delay = IntVar(value=3)
+        self.slideshow_prefetch_count = 2
+        self.slideshow_late_tolerance_ms = 20
+        self.slideshow_prefetch = {}
+        self.slideshow_generation = 0
+        self.slideshow_job = None
+        self.slideshow_executor = None
+        self.slideshow_stats = {}
         self.current_directory = None
         self.directory_files = []
+        self.all_directory_files = []
         self.current_directory_index = -1
+        self.sort_order = StringVar(value="name")
+        self.filter_camera = StringVar(value="")
+        self.filter_format = StringVar(value="")
+        self.filter_min_megapixels = DoubleVar(value=0.0)
         self.last_save_directory = os.path.expanduser("~")
         self.last_open_directory = os.path.expanduser("~")
         self.is_fullscreen = False
@@ -76,6 +2238,48 @@ class HEICViewerApp:
         self.contrast_value = DoubleVar(value=1.0)
         self.sharpness_value = DoubleVar(value=1.0)
         self.settings_file = os.path.join(os.path.expanduser("~"), ".heicviewer_settings.json")
+        self.progress_poll_interval = 100  # ms between progress queue drains (10 Hz)
+        self.batch_workers = IntVar(value=min(4, os.cpu_count() or 1))
+        self.batch_memory_budget_mb = IntVar(value=1024)
+        self.target_size_kb = IntVar(value=0)
+        self.encoder_preset = StringVar(value="default")
+        self.directory_metadata = {}
+        self.index_directory = None
+        self.index_scan_state = None
+        self.directory_watcher = None
+        self.open_generation = 0
+        self.metadata_service = MetadataService()
+        self.image_cache_mb = IntVar(value=512)
+        self.image_cache = ImageCache(self.image_cache_mb.get() * 1024 * 1024)
+        self.image_cache_mb.trace_add("write",
+                                      lambda *args: self.image_cache.set_limit(self.image_cache_mb.get() * 1024 * 1024))
+        self.current_frame = 0
+        self.high_bit_depth = BooleanVar(value=False)
+        self.display_cache = OrderedDict()
+        self.histogram_cache = OrderedDict()
+        self.histogram_source = None
+        self.histogram_job = None
+        self.histogram_text = StringVar(value="")
+        self.current_metadata = None
+        self.watcher_poll_interval = 250
+        self.index_scan_cancel = Event()
+        # Both are opened by open_caches() off the Tk thread
+        self.directory_index = None
+        self.thumbnail_cache = None
+        self.thumbnail_executor = None
+        self.first_paint_done = False
+        self.sidebar_tools_built = False
+        self.startup_milestones = set()
+        self.instance_server = None
+        self.export_queue = queue.Queue()
+        self.export_results = queue.Queue()
+        self.export_worker = None
+        self.pending_exports = 0
+        self.current_export = None
+        self.export_status = StringVar(value="")
+        self.tiff_tile_size = IntVar(value=256)
+        self.tiff_compression = StringVar(value="deflate")
+        self.tiff_pyramid = BooleanVar(value=True)
 
     def setup_ui(self):
         self.root.configure(bg='#2B2B2B')
@@ -116,6 +2320,19 @@ class HEICViewerApp:
         theme = "dark" if self.is_dark_mode.get() else "light"
         return self.colors[theme][key]
 
+    def int_entry(self, parent, variable, width=6):
+        # The persisted IntVar only ever receives clean integers, so a half-typed value cannot break
+        # save_settings or any other get(); the last valid number stays in effect meanwhile.
+        text = StringVar(value=str(variable.get()))
+
+        def sync(*args):
+            value = text.get().strip()
+            if value.isdigit():
+                variable.set(int(value))
+
+        text.trace_add("write", sync)
+        return Entry(parent, textvariable=text, width=width)
+
     def update_theme(self):
         bg_color = self.get_theme_color("bg")
         canvas_bg = self.get_theme_color("canvas_bg")
@@ -132,6 +2349,8 @@ class HEICViewerApp:
         self.status_bar.configure(bg=bg_color)
         self.status_label.configure(bg=bg_color, fg=text_color)
         self.info_label.configure(bg=bg_color, fg=text_color)
+        self.export_label.configure(bg=bg_color, fg=text_color)
+        self.histogram_canvas.configure(bg=canvas_bg)
 
         for widget in self.toolbar_frame.winfo_children():
             if isinstance(widget, tk.Button):
@@ -260,6 +2479,24 @@ class HEICViewerApp:
                                 length=180)
         sharpness_scale.pack(fill=tk.X)
 
+        histogram_frame = Frame(self.sidebar_frame, bg=self.get_theme_color("sidebar_bg"))
+        histogram_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        self.histogram_canvas = Canvas(histogram_frame, width=180, height=70,
+                                       bg=self.get_theme_color("canvas_bg"),
+                                       bd=0, highlightthickness=0)
+        self.histogram_canvas.pack(fill=tk.X)
+
+        Label(histogram_frame, textvariable=self.histogram_text, font=('Helvetica', 8),
+              bg=self.get_theme_color("sidebar_bg"),
+              fg=self.get_theme_color("text")).pack(anchor=tk.W)
+
+    def build_sidebar_tools(self):
+        # Filters, export controls and the extra buttons are built after the first paint
+        if self.sidebar_tools_built:
+            return
+        self.sidebar_tools_built = True
+
         filter_frame = Frame(self.sidebar_frame, bg=self.get_theme_color("sidebar_bg"))
         filter_frame.pack(fill=tk.X, padx=10, pady=5)
 
@@ -312,6 +2549,30 @@ class HEICViewerApp:
                               length=180)
         quality_scale.pack(fill=tk.X)
 
+        target_frame = Frame(export_frame, bg=self.get_theme_color("sidebar_bg"))
+        target_frame.pack(fill=tk.X, pady=2)
+
+        Label(target_frame, text="Target size KB (0 = off):",
+              bg=self.get_theme_color("sidebar_bg"),
+              fg=self.get_theme_color("text")).pack(side=tk.LEFT)
+
+        target_entry = self.int_entry(target_frame, self.target_size_kb)
+        target_entry.pack(side=tk.RIGHT)
+
+        preset_frame = Frame(export_frame, bg=self.get_theme_color("sidebar_bg"))
+        preset_frame.pack(fill=tk.X, pady=2)
+
+        Label(preset_frame, text="Encoder preset:",
+              bg=self.get_theme_color("sidebar_bg"),
+              fg=self.get_theme_color("text")).pack(side=tk.LEFT)
+
+        preset_menu = tk.OptionMenu(preset_frame, self.encoder_preset, *PRESET_NAMES)
+        preset_menu.configure(bg=self.get_theme_color("button_bg"),
+                              fg=self.get_theme_color("text"),
+                              relief='flat',
+                              highlightthickness=0)
+        preset_menu.pack(side=tk.RIGHT)
+
         export_buttons_frame = Frame(export_frame, bg=self.get_theme_color("sidebar_bg"))
         export_buttons_frame.pack(fill=tk.X, pady=5)
 
@@ -378,6 +2639,12 @@ class HEICViewerApp:
                                 anchor=tk.E)
         self.info_label.pack(side=tk.RIGHT, padx=10)
 
+        self.export_label = Label(self.status_bar, textvariable=self.export_status,
+                                  bg=self.get_theme_color("bg"),
+                                  fg=self.get_theme_color("text"),
+                                  anchor=tk.E)
+        self.export_label.pack(side=tk.RIGHT, padx=10)
+
     def create_menu(self):
         self.menu_bar = Menu(self.root)
         self.root.config(menu=self.menu_bar)
@@ -387,6 +2654,8 @@ class HEICViewerApp:
         file_menu.add_command(label="Open", command=self.open_heic, accelerator="Ctrl+O")
         file_menu.add_command(label="Save As JPEG", command=self.save_as_jpeg, accelerator="Ctrl+S")
         file_menu.add_command(label="Save As PNG", command=self.save_as_png, accelerator="Ctrl+P")
+        file_menu.add_command(label="Export Tiled TIFF...", command=self.show_tiled_tiff_export)
+        file_menu.add_command(label="Save Orientation (Lossless)", command=self.save_orientation)
         file_menu.add_separator()
 
         self.recent_menu = Menu(file_menu, tearoff=0)
@@ -422,12 +2691,30 @@ class HEICViewerApp:
         view_menu.add_checkbutton(label="Show Info", variable=self.show_info, command=self.toggle_info)
         view_menu.add_command(label="Toggle Full Screen", command=self.toggle_fullscreen, accelerator="F11")
         view_menu.add_separator()
+        view_menu.add_command(label="Next Image in File", command=self.next_frame, accelerator="Page Down")
+        view_menu.add_command(label="Previous Image in File", command=self.previous_frame, accelerator="Page Up")
+        view_menu.add_separator()
+
+        sort_menu = Menu(view_menu, tearoff=0)
+        view_menu.add_cascade(label="Sort By", menu=sort_menu)
+        for text, value in SORT_ORDERS:
+            sort_menu.add_radiobutton(label=text, variable=self.sort_order, value=value,
+                                      command=self.apply_navigation_order)
+
+        view_menu.add_command(label="Filter Images...", command=self.show_filter_dialog)
+        view_menu.add_command(label="Thumbnail Browser", command=self.show_thumbnail_browser, accelerator="Ctrl+G")
+        view_menu.add_separator()
         view_menu.add_command(label="Toggle Theme", command=self.toggle_theme, accelerator="Ctrl+T")
 
         tools_menu = Menu(self.menu_bar, tearoff=0)
         self.menu_bar.add_cascade(label="Tools", menu=tools_menu)
         tools_menu.add_command(label="Show Metadata", command=self.show_metadata, accelerator="Ctrl+M")
         tools_menu.add_command(label="Image Info", command=self.show_image_info, accelerator="Ctrl+I")
+        tools_menu.add_command(label="Encoder Benchmark", command=self.run_benchmark)
+        tools_menu.add_command(label="Export Directory Metadata...", command=self.show_metadata_export)
+        tools_menu.add_command(label="Lossless Rotate Files...", command=self.show_lossless_rotate)
+        tools_menu.add_checkbutton(label="16-bit HEIF Editing", variable=self.high_bit_depth,
+                                   command=self.toggle_high_bit_depth)
         tools_menu.add_separator()
 
         filter_menu = Menu(tools_menu, tearoff=0)
@@ -480,11 +2767,14 @@ class HEICViewerApp:
         self.root.bind("<Control-e>", lambda e: self.resize_image())
         self.root.bind("<Control-m>", lambda e: self.show_metadata())
         self.root.bind("<Control-i>", lambda e: self.show_image_info())
+        self.root.bind("<Control-g>", lambda e: self.show_thumbnail_browser())
         self.root.bind("<F5>", lambda e: self.toggle_slideshow())
         self.root.bind("<F11>", lambda e: self.toggle_fullscreen())
         self.root.bind("<Escape>", lambda e: self.cancel_fullscreen_or_crop())
         self.root.bind("<Left>", lambda e: self.previous_image())
         self.root.bind("<Right>", lambda e: self.next_image())
+        self.root.bind("<Next>", lambda e: self.next_frame())
+        self.root.bind("<Prior>", lambda e: self.previous_frame())
         self.root.bind("<Delete>", lambda e: self.delete_current_image())
 
         self.root.bind("<MouseWheel>", self.on_mousewheel)
@@ -496,6 +2786,15 @@ class HEICViewerApp:
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def on_close(self):
+        if self.pending_exports and not messagebox.askyesno(
+                "Exports Pending", f"{self.pending_exports} export(s) are still being written. Quit anyway?"):
+            return
+        if self.is_slideshow_active:
+            self.stop_slideshow()
+        if self.instance_server:
+            self.instance_server.stop()
+        if self.directory_watcher:
+            self.directory_watcher.stop()
         self.save_settings()
         self.root.quit()
 
@@ -515,6 +2814,26 @@ class HEICViewerApp:
                         self.recent_files = settings['recent_files']
                     if 'slideshow_delay' in settings:
                         self.slideshow_delay.set(settings['slideshow_delay'])
+                    if 'batch_workers' in settings:
+                        self.batch_workers.set(settings['batch_workers'])
+                    if 'batch_memory_budget_mb' in settings:
+                        self.batch_memory_budget_mb.set(settings['batch_memory_budget_mb'])
+                    if 'tiff_tile_size' in settings:
+                        self.tiff_tile_size.set(settings['tiff_tile_size'])
+                    if 'tiff_compression' in settings:
+                        self.tiff_compression.set(settings['tiff_compression'])
+                    if 'tiff_pyramid' in settings:
+                        self.tiff_pyramid.set(settings['tiff_pyramid'])
+                    if 'high_bit_depth' in settings:
+                        self.high_bit_depth.set(settings['high_bit_depth'])
+                    if 'image_cache_mb' in settings:
+                        self.image_cache_mb.set(settings['image_cache_mb'])
+                    if 'target_size_kb' in settings:
+                        self.target_size_kb.set(settings['target_size_kb'])
+                    if settings.get('encoder_preset') in PRESET_NAMES:
+                        self.encoder_preset.set(settings['encoder_preset'])
+                    if settings.get('sort_order') in [value for _, value in SORT_ORDERS]:
+                        self.sort_order.set(settings['sort_order'])
                     if 'last_save_directory' in settings:
                         self.last_save_directory = settings['last_save_directory']
                     if 'last_open_directory' in settings:
@@ -550,6 +2869,16 @@ class HEICViewerApp:
                 'quality_value': self.quality_value.get(),
                 'recent_files': self.recent_files,
                 'slideshow_delay': self.slideshow_delay.get(),
+                'batch_workers': self.batch_workers.get(),
+                'batch_memory_budget_mb': self.batch_memory_budget_mb.get(),
+                'image_cache_mb': self.image_cache_mb.get(),
+                'high_bit_depth': self.high_bit_depth.get(),
+                'tiff_tile_size': self.tiff_tile_size.get(),
+                'tiff_compression': self.tiff_compression.get(),
+                'tiff_pyramid': self.tiff_pyramid.get(),
+                'target_size_kb': self.target_size_kb.get(),
+                'encoder_preset': self.encoder_preset.get(),
+                'sort_order': self.sort_order.get(),
                 'last_save_directory': self.last_save_directory,
                 'last_open_directory': self.last_open_directory
             }
@@ -564,7 +2893,8 @@ class HEICViewerApp:
         file_path = filedialog.askopenfilename(
             initialdir=self.last_open_directory,
             filetypes=[
-                ("Image files", "*.heic *.HEIC *.heif *.HEIF *.jpg *.jpeg *.JPG *.JPEG *.png *.PNG")
+                ("Image files",
+                 "*.heic *.HEIC *.heif *.HEIF *.jpg *.jpeg *.JPG *.JPEG *.png *.PNG *.tif *.tiff *.TIF *.TIFF")
             ]
         )
 
@@ -574,32 +2904,130 @@ class HEICViewerApp:
         self.open_image_file(file_path)
 
     def open_image_file(self, file_path):
+        self.last_open_directory = os.path.dirname(file_path)
+        self.current_file_path = file_path
+
         try:
-            self.last_open_directory = os.path.dirname(file_path)
-            self.current_file_path = file_path
+            self.show_preview(file_path)
+        except Exception:
+            pass
+
+        self.add_to_recent_files(file_path)
+        self.scan_directory(file_path)
+        self.load_image_async(file_path, 0)
+
+    def load_image_async(self, file_path, frame_index):
+        # Editing is disabled until the full decode arrives; a newer open supersedes this one.
+        self.open_generation += 1
+        generation = self.open_generation
+        self.original_image = None
+        self.heic_image = None
+        self.displayed_image = None
+        self.current_metadata = None
+        self.current_frame = frame_index
+        self.reset_image_state()
 
-            self.original_image = Image.open(file_path)
-            self.heic_image = self.original_image.copy()
-            self.displayed_image = self.heic_image.copy()
+        self.status_message.set(f"Loading: {os.path.basename(file_path)}")
+
+        result = {}
+        high_bit_depth = self.high_bit_depth.get()
+
+        def decode():
+            try:
+                result["metadata"] = self.metadata_service.get(file_path)
+            except Exception:
+                # Metadata only feeds the info bar and frame count; the image itself can still be shown
+                result["metadata"] = None
+            try:
+                img = self.load_frame(file_path, frame_index, high_bit_depth)
+                result["images"] = (img, img.copy(), img.copy())
+            except Exception as e:
+                result["error"] = str(e)
 
-            self.reset_image_state()
-            self.add_to_recent_files(file_path)
-            self.scan_directory(file_path)
+        def check_finished():
+            if generation != self.open_generation:
+                return
+
+            if worker.is_alive():
+                self.root.after(10, check_finished)
+                return
+
+            if "error" in result:
+                messagebox.showerror("Error", f"Failed to open file: {result['error']}")
+                self.status_message.set("Error opening file")
+                return
+
+            self.original_image, self.heic_image, self.displayed_image = result["images"]
+            self.current_metadata = result["metadata"]
+            self.applied_orientation = getattr(self.original_image, "info", {}).get("applied_orientation")
 
             # Instead of simply updating, call fill_to_window to adjust zoom level appropriately.
             self.update_image()
             self.fill_to_window()
+            self.report_startup("image shown")
 
             self.status_message.set(f"Opened: {os.path.basename(file_path)}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to open file: {str(e)}")
-            self.status_message.set("Error opening file")
+
+        worker = Thread(target=decode, daemon=True)
+        worker.start()
+        self.root.after(10, check_finished)
+
+    def load_frame(self, file_path, frame_index=0, high_bit_depth=False):
+        # Runs on worker threads, so the Tk flag is read by the caller and passed in
+        high_bit = high_bit_depth and os.path.splitext(file_path)[1].lower() in HEIF_EXTENSIONS
+        key = (file_path, os.stat(file_path).st_mtime_ns, frame_index, high_bit)
+        img = self.image_cache.get(key)
+        if img is None:
+            img = (high_bit and decode_high_bit_frame(file_path, frame_index)) or decode_frame(file_path, frame_index)
+            self.image_cache.put(key, img)
+        return img
+
+    def toggle_high_bit_depth(self):
+        state = "on" if self.high_bit_depth.get() else "off"
+        self.status_message.set(f"16-bit HEIF editing {state}; applies to images opened from now on")
+
+    def frame_count(self):
+        return self.current_metadata["frames"] if self.current_metadata else 1
+
+    def show_frame(self, frame_index):
+        if not self.current_file_path or not 0 <= frame_index < self.frame_count():
+            return
+        self.load_image_async(self.current_file_path, frame_index)
+
+    def next_frame(self):
+        self.show_frame(self.current_frame + 1)
+
+    def previous_frame(self):
+        self.show_frame(self.current_frame - 1)
+
+    def show_preview(self, file_path):
+        canvas_width = self.canvas.winfo_width()
+        canvas_height = self.canvas.winfo_height()
+        if canvas_width <= 1 or canvas_height <= 1:
+            return
+
+        preview = load_embedded_thumbnail(file_path, target_size=max(canvas_width, canvas_height))
+        if not preview:
+            return
+
+        # Scale to the size the full image will have after fill_to_window so the swap does not jump
+        with open_image(file_path) as img:
+            full_width, full_height = oriented_size(img)
+        zoom = max(canvas_width / full_width, canvas_height / full_height)
+        size = (max(1, int(full_width * zoom)), max(1, int(full_height * zoom)))
+
+        self.heic_photo = ImageTk.PhotoImage(preview.resize(size, Image.BILINEAR))
+        self.canvas.delete("all")
+        self.canvas.config(scrollregion=(0, 0, size[0], size[1]))
+        self.canvas.create_image(canvas_width // 2, canvas_height // 2, image=self.heic_photo, anchor='center')
 
     def reset_image_state(self):
         self.zoom_level = 1.0
         self.rotation_angle = 0
         self.edit_history = []
         self.edit_position = -1
+        self.net_orientation = 1
+        self.applied_orientation = None
         self.brightness_value.set(1.0)
         self.contrast_value.set(1.0)
         self.sharpness_value.set(1.0)
@@ -644,20 +3072,329 @@ class HEICViewerApp:
     def scan_directory(self, file_path):
         directory = os.path.dirname(file_path)
         if directory:
+            if directory == self.current_directory and self.directory_watcher and self.directory_watcher.is_alive():
+                # The watcher keeps the listing current, so navigating within the folder needs no rescan
+                if file_path not in self.all_directory_files and os.path.isfile(file_path):
+                    self.all_directory_files.append(file_path)
+                self.apply_navigation_order(file_path)
+                return
+
             self.current_directory = directory
-            self.directory_files = []
+            self.all_directory_files = []
 
+            # Watch first, then list: a file that appears in between is reported by the watcher rather than lost
+            self.start_directory_watcher(directory)
             for f in os.listdir(directory):
-                if f.lower().endswith(('.heic', '.heif', '.jpg', '.jpeg', '.png')):
+                if f.lower().endswith(IMAGE_EXTENSIONS):
                     full_path = os.path.join(directory, f)
-                    self.directory_files.append(full_path)
+                    self.all_directory_files.append(full_path)
+
+            self.start_index_scan(directory)
+            self.apply_navigation_order(file_path)
+
+    def start_directory_watcher(self, directory):
+        if self.directory_watcher:
+            self.directory_watcher.stop()
+
+        self.directory_watcher = DirectoryWatcher(directory)
+        self.directory_watcher.start()
+        # Adding the inotify watch (or taking the first poll snapshot) is quick; the bound only guards a stuck mount
+        self.directory_watcher.ready.wait(1.0)
+        self.root.after(self.watcher_poll_interval, self.poll_directory_watcher, self.directory_watcher)
+
+    def start_instance_server(self):
+        if not hasattr(socket, "AF_UNIX"):
+            return
+
+        server = InstanceServer(instance_socket_path())
+        try:
+            server.start()
+        except OSError:
+            # Another instance already owns the socket; this window simply runs on its own
+            return
+
+        self.instance_server = server
+        self.root.after(self.watcher_poll_interval, self.poll_instance_server)
+
+    def poll_instance_server(self):
+        if not self.instance_server:
+            return
+
+        # Only the newest request matters when several launches arrive between polls
+        file_path = None
+        while True:
+            try:
+                file_path = self.instance_server.requests.get_nowait()
+            except queue.Empty:
+                break
+
+        if file_path and os.path.isfile(file_path):
+            self.root.deiconify()
+            self.root.lift()
+            self.root.focus_force()
+            self.open_image_file(file_path)
 
-            self.directory_files.sort()
+        self.root.after(self.watcher_poll_interval, self.poll_instance_server)
 
-            if file_path in self.directory_files:
-                self.current_directory_index = self.directory_files.index(file_path)
+    def poll_directory_watcher(self, watcher):
+        if watcher is not self.directory_watcher:
+            return
+
+        # Last event per path wins, so a file created and deleted between polls is a no-op
+        changes = {}
+        while True:
+            try:
+                event = watcher.events.get_nowait()
+            except queue.Empty:
+                break
+
+            if event[0] == "renamed":
+                old_path, new_path = event[1], event[2]
+                changes[old_path] = "removed"
+                changes[new_path] = "added"
+                if self.current_file_path == old_path:
+                    self.current_file_path = new_path
             else:
-                self.current_directory_index = -1
+                changes[event[1]] = event[0]
+
+        if changes:
+            self.apply_directory_delta([path for path, kind in changes.items() if kind == "added"],
+                                       [path for path, kind in changes.items() if kind == "removed"])
+
+        self.root.after(self.watcher_poll_interval, self.poll_directory_watcher, watcher)
+
+    def apply_directory_delta(self, added, removed):
+        for path in removed:
+            if path in self.all_directory_files:
+                self.all_directory_files.remove(path)
+            self.directory_metadata.pop(path, None)
+
+        for path in added:
+            if path not in self.all_directory_files:
+                self.all_directory_files.append(path)
+            # Re-read on next refresh; a file reported again was rewritten in place
+            self.directory_metadata.pop(path, None)
+
+        self.apply_navigation_order()
+
+        if not self.directory_index:
+            return
+
+        directory = self.current_directory
+        result = {}
+
+        def update_index():
+            try:
+                self.directory_index.remove_files(removed)
+                result["rows"] = self.directory_index.refresh_files(added)
+            except Exception as e:
+                result["error"] = str(e)
+
+        def check_finished():
+            if worker.is_alive():
+                self.root.after(self.progress_poll_interval, check_finished)
+                return
+
+            if directory != self.current_directory or "rows" not in result:
+                return
+
+            self.directory_metadata.update(result["rows"])
+            self.apply_navigation_order()
+
+        worker = Thread(target=update_index, daemon=True)
+        worker.start()
+        self.root.after(self.progress_poll_interval, check_finished)
+
+    def get_file_metadata(self, file_path):
+        metadata = self.directory_metadata.get(file_path)
+        if metadata and metadata.get("mtime") is not None:
+            return metadata
+
+        # Not indexed yet: a stat is cheap, the pixel data is never touched here
+        try:
+            stat = os.stat(file_path)
+            return {"mtime": stat.st_mtime, "size": stat.st_size}
+        except OSError:
+            return {"mtime": 0, "size": 0}
+
+    def navigation_sort_key(self, file_path):
+        order = self.sort_order.get()
+        if order == "natural":
+            return natural_sort_key(os.path.basename(file_path))
+
+        metadata = self.get_file_metadata(file_path)
+        if order == "mtime":
+            return metadata["mtime"], file_path
+        if order == "size":
+            return metadata["size"], file_path
+        if order == "capture_date":
+            # Undated files go last, ordered by modification time
+            capture_date = metadata.get("capture_date")
+            return capture_date is None, capture_date or "", metadata["mtime"], file_path
+        return file_path
+
+    def matches_navigation_filter(self, file_path):
+        metadata = self.directory_metadata.get(file_path, {})
+
+        camera = self.filter_camera.get()
+        if camera and metadata.get("camera") != camera:
+            return False
+
+        file_format = self.filter_format.get()
+        if file_format:
+            actual = metadata.get("format") or EXTENSION_FORMATS.get(os.path.splitext(file_path)[1].lower())
+            if actual != file_format:
+                return False
+
+        min_pixels = self.filter_min_megapixels.get() * 1000000
+        if min_pixels > 0 and metadata.get("width") and metadata.get("height"):
+            if metadata["width"] * metadata["height"] < min_pixels:
+                return False
+
+        return True
+
+    def apply_navigation_order(self, current_file=None):
+        current_file = current_file or self.current_file_path
+
+        self.directory_files = sorted(
+            (f for f in self.all_directory_files if self.matches_navigation_filter(f)),
+            key=self.navigation_sort_key
+        )
+
+        if current_file in self.directory_files:
+            self.current_directory_index = self.directory_files.index(current_file)
+        else:
+            self.current_directory_index = -1
+
+    def show_filter_dialog(self):
+        filter_window = tk.Toplevel(self.root)
+        filter_window.title("Filter Images")
+        filter_window.geometry("320x220")
+        filter_window.resizable(False, False)
+        filter_window.transient(self.root)
+        filter_window.grab_set()
+
+        if self.is_dark_mode.get():
+            filter_window.configure(bg=self.get_theme_color("bg"))
+
+        cameras = sorted({m["camera"] for m in self.directory_metadata.values() if m.get("camera")})
+        formats = sorted(set(EXTENSION_FORMATS.values()))
+
+        camera_var = StringVar(value=self.filter_camera.get() or "Any")
+        format_var = StringVar(value=self.filter_format.get() or "Any")
+        megapixels_var = DoubleVar(value=self.filter_min_megapixels.get())
+
+        Label(filter_window, text="Filter Images", font=("Helvetica", 12, "bold"),
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).pack(pady=10)
+
+        options_frame = Frame(filter_window,
+                              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None)
+        options_frame.pack(fill=tk.X, padx=20, pady=5)
+
+        Label(options_frame, text="Camera:",
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).grid(row=0, column=0, sticky=tk.W)
+        tk.OptionMenu(options_frame, camera_var, "Any", *cameras).grid(row=0, column=1, sticky=tk.W, padx=5)
+
+        Label(options_frame, text="Format:",
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).grid(row=1, column=0, sticky=tk.W)
+        tk.OptionMenu(options_frame, format_var, "Any", *formats).grid(row=1, column=1, sticky=tk.W, padx=5)
+
+        Label(options_frame, text="Min. megapixels:",
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).grid(row=2, column=0, sticky=tk.W)
+        Entry(options_frame, textvariable=megapixels_var, width=6).grid(row=2, column=1, sticky=tk.W, padx=5)
+
+        button_frame = Frame(filter_window,
+                             bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None)
+        button_frame.pack(fill=tk.X, padx=20, pady=15)
+
+        def apply_filter():
+            try:
+                megapixels = max(0.0, megapixels_var.get())
+            except tk.TclError:
+                messagebox.showerror("Invalid Value", "Minimum megapixels must be a number.", parent=filter_window)
+                return
+
+            self.filter_camera.set("" if camera_var.get() == "Any" else camera_var.get())
+            self.filter_format.set("" if format_var.get() == "Any" else format_var.get())
+            self.filter_min_megapixels.set(megapixels)
+            self.apply_navigation_order()
+            self.status_message.set(f"{len(self.directory_files)} of {len(self.all_directory_files)} images shown")
+            filter_window.destroy()
+
+        def clear_filter():
+            camera_var.set("Any")
+            format_var.set("Any")
+            megapixels_var.set(0.0)
+            apply_filter()
+
+        tk.Button(
+            button_frame, text="Apply",
+            command=apply_filter,
+            bg=self.get_theme_color("button_bg") if self.is_dark_mode.get() else None,
+            fg=self.get_theme_color("text") if self.is_dark_mode.get() else None
+        ).pack(side=tk.LEFT, padx=5)
+
+        tk.Button(
+            button_frame, text="Clear",
+            command=clear_filter,
+            bg=self.get_theme_color("button_bg") if self.is_dark_mode.get() else None,
+            fg=self.get_theme_color("text") if self.is_dark_mode.get() else None
+        ).pack(side=tk.LEFT, padx=5)
+
+        tk.Button(
+            button_frame, text="Cancel",
+            command=filter_window.destroy,
+            bg=self.get_theme_color("button_bg") if self.is_dark_mode.get() else None,
+            fg=self.get_theme_color("text") if self.is_dark_mode.get() else None
+        ).pack(side=tk.RIGHT, padx=5)
+
+    def start_index_scan(self, directory):
+        if not self.directory_index:
+            return
+
+        if directory == self.index_directory and self.index_scan_state in ("scanning", "done"):
+            return
+
+        # Serve whatever the index already knows straight away, then refresh in the background
+        self.index_scan_cancel.set()
+        self.index_scan_cancel = Event()
+        self.index_directory = directory
+        self.index_scan_state = "scanning"
+        self.directory_metadata = self.directory_index.directory_entries(directory)
+
+        cancel_event = self.index_scan_cancel
+        result = {}
+
+        def scan():
+            try:
+                result["entries"] = self.directory_index.refresh_directory(directory, cancel_event)
+            except Exception as e:
+                result["error"] = str(e)
+
+        def check_finished():
+            if worker.is_alive():
+                self.root.after(self.progress_poll_interval, check_finished)
+                return
+
+            if cancel_event.is_set() or directory != self.index_directory:
+                return
+
+            if "error" in result:
+                self.index_scan_state = "failed"
+                self.status_message.set(f"Error indexing directory: {result['error']}")
+                return
+
+            self.index_scan_state = "done"
+            self.directory_metadata = result["entries"]
+            self.apply_navigation_order()
+
+        worker = Thread(target=scan, daemon=True)
+        worker.start()
+        self.root.after(self.progress_poll_interval, check_finished)
 
     def update_image(self):
         if not self.displayed_image:
@@ -672,9 +3409,32 @@ class HEICViewerApp:
         if scaled_height < 1:
             scaled_height = 1
 
-        # Resize the image with the new dimensions
-        displayed = self.displayed_image.resize((scaled_width, scaled_height), Image.LANCZOS)
-        self.heic_photo = ImageTk.PhotoImage(displayed)
+        self.show_photo(self.render_display((scaled_width, scaled_height)))
+
+        self.update_image_info()
+        self.schedule_histogram()
+
+    def render_display(self, size):
+        image = self.displayed_image
+        if not isinstance(image, HighBitImage):
+            return image.resize(size, Image.LANCZOS)
+
+        # The 8-bit conversion is the only lossy step of the 16-bit pipeline, so keep it per zoom level
+        key = (id(image), size)
+        cached = self.display_cache.get(key)
+        if cached and cached[0]() is image:
+            self.display_cache.move_to_end(key)
+            return cached[1]
+
+        rendered = image.resize(size, Image.LANCZOS).to_8bit()
+        self.display_cache[key] = (weakref.ref(image), rendered)
+        while len(self.display_cache) > 8:
+            self.display_cache.popitem(last=False)
+        return rendered
+
+    def show_photo(self, scaled_image):
+        scaled_width, scaled_height = scaled_image.size
+        self.heic_photo = ImageTk.PhotoImage(scaled_image)
 
         # Update the scroll region if you're using scrollbars
         self.canvas.config(scrollregion=(0, 0, scaled_width, scaled_height))
@@ -689,20 +3449,86 @@ class HEICViewerApp:
         # Draw the image centered on the canvas
         self.canvas.create_image(x_center, y_center, image=self.heic_photo, anchor='center')
 
-        self.update_image_info()
+    def schedule_histogram(self):
+        # Zooming and panning keep the same image object, so only real edits get past this check
+        if self.displayed_image is self.histogram_source:
+            return
+        self.histogram_source = self.displayed_image
+
+        if self.histogram_job:
+            self.root.after_cancel(self.histogram_job)
+        self.histogram_job = self.root.after(150, self.start_histogram_job)
+
+    def start_histogram_job(self):
+        self.histogram_job = None
+        image = self.displayed_image
+        if image is None or image is not self.histogram_source:
+            return
+
+        cached = self.histogram_cache.get(id(image))
+        if cached and cached[0]() is image:
+            self.draw_histogram(cached[1])
+            return
+
+        result = {}
+
+        def compute():
+            try:
+                result["histogram"] = compute_histogram(image)
+            except Exception:
+                pass
+
+        def check_finished():
+            if worker.is_alive():
+                self.root.after(self.progress_poll_interval, check_finished)
+                return
+
+            if "histogram" not in result:
+                return
+
+            self.histogram_cache[id(image)] = (weakref.ref(image), result["histogram"])
+            while len(self.histogram_cache) > 32:
+                self.histogram_cache.popitem(last=False)
+
+            if image is self.displayed_image:
+                self.draw_histogram(result["histogram"])
+
+        worker = Thread(target=compute, daemon=True)
+        worker.start()
+        self.root.after(self.progress_poll_interval, check_finished)
+
+    def draw_histogram(self, histogram):
+        self.histogram_canvas.delete("all")
+        width = self.histogram_canvas.winfo_width()
+        if width <= 1:
+            width = int(self.histogram_canvas["width"])
+        height = int(self.histogram_canvas["height"])
+
+        # Scale to the tallest interior bin so a clipped spike at 0 or 255 does not flatten the rest
+        peak = max(max(channel[1:255]) for channel in histogram["channels"]) or 1
+
+        for channel, color in zip(histogram["channels"], ("#E05050", "#50C050", "#5080E0")):
+            points = []
+            for i, count in enumerate(channel):
+                points.extend((i * (width - 1) / 255, height - min(count / peak, 1.0) * (height - 1)))
+            self.histogram_canvas.create_line(*points, fill=color)
+
+        self.histogram_text.set(f"Clipped: shadows {histogram['shadows_clipped'] * 100:.1f}%, "
+                                f"highlights {histogram['highlights_clipped'] * 100:.1f}%")
 
     def update_image_info(self):
         if self.displayed_image and self.show_info.get():
             file_name = os.path.basename(self.current_file_path) if self.current_file_path else "Untitled"
             width, height = self.displayed_image.size
 
-            try:
-                file_size = os.path.getsize(self.current_file_path)
-                size_str = self.format_file_size(file_size)
-            except:
+            if self.current_metadata:
+                size_str = self.format_file_size(self.current_metadata["file_size"])
+            else:
                 size_str = "Unknown"
 
             info_text = f"{file_name} | {width}x{height} | {size_str} | {int(self.zoom_level * 100)}%"
+            if self.frame_count() > 1:
+                info_text += f" | Image {self.current_frame + 1}/{self.frame_count()}"
             self.image_info.set(info_text)
         else:
             self.image_info.set("")
@@ -717,6 +3543,14 @@ class HEICViewerApp:
         else:
             return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
 
+    def format_duration(self, seconds):
+        seconds = int(round(seconds))
+        hours, remainder = divmod(seconds, 3600)
+        minutes, seconds = divmod(remainder, 60)
+        if hours:
+            return f"{hours}:{minutes:02d}:{seconds:02d}"
+        return f"{minutes}:{seconds:02d}"
+
     def save_as_jpeg(self):
         if not self.displayed_image:
             messagebox.showinfo("No Image", "No image is currently loaded.")
@@ -729,22 +3563,100 @@ class HEICViewerApp:
         )
 
         if file_path:
+            self.last_save_directory = os.path.dirname(file_path)
+            image = self.displayed_image
+            settings = self.lossy_settings()
+
+            def write(path):
+                rgb_image = to_display(image)
+                if rgb_image.mode == 'RGBA':
+                    flattened = Image.new('RGB', rgb_image.size, (255, 255, 255))
+                    flattened.paste(rgb_image, mask=rgb_image.split()[3])
+                    rgb_image = flattened
+                return self.save_lossy(rgb_image, path, 'JPEG', *settings)
+
+            self.queue_export(file_path, "JPEG", write)
+
+    def lossy_settings(self):
+        # Read on the Tk thread when the save is queued; the export worker must not touch Tk variables
+        return self.quality_value.get(), self.encoder_preset.get(), self.target_size_kb.get()
+
+    def save_lossy(self, image, file_path, format_name, quality, preset, target_kb):
+        params = encoder_params(format_name, preset)
+        if target_kb <= 0:
+            image.save(file_path, format=format_name, quality=quality, **params)
+            return ""
+
+        data, quality, trials, fits = encode_to_target_size(image, format_name, target_kb * 1024, **params)
+        with open(file_path, 'wb') as f:
+            f.write(data)
+
+        details = f" (quality {quality}, {self.format_file_size(len(data))}, {trials} trial encodes)"
+        if not fits:
+            details += f" - could not reach {target_kb} KB"
+        return details
+
+    def queue_export(self, file_path, label, write):
+        # Edits always produce new image objects, so the image captured by write is already a snapshot
+        if self.export_worker is None:
+            self.export_worker = Thread(target=self.run_exports, daemon=True)
+            self.export_worker.start()
+
+        self.pending_exports += 1
+        self.export_queue.put((file_path, label, write))
+        self.update_export_status()
+        if self.pending_exports == 1:
+            self.root.after(self.progress_poll_interval, self.poll_exports)
+
+    def run_exports(self):
+        while True:
+            file_path, label, write = self.export_queue.get()
+            self.export_results.put(("started", file_path))
+
+            # Encode next to the destination and rename into place, so a crash never leaves a half-written file
+            directory, name = os.path.split(file_path)
+            temp_path = os.path.join(directory, f".{name}.{os.getpid()}.part")
             try:
-                self.last_save_directory = os.path.dirname(file_path)
-                quality = self.quality_value.get()
-
-                if self.displayed_image.mode == 'RGBA':
-                    rgb_image = Image.new('RGB', self.displayed_image.size, (255, 255, 255))
-                    rgb_image.paste(self.displayed_image, mask=self.displayed_image.split()[3])
-                    rgb_image.save(file_path, format='JPEG', quality=quality)
-                else:
-                    self.displayed_image.save(file_path, format='JPEG', quality=quality)
-
-                self.status_message.set(f"Saved as JPEG: {os.path.basename(file_path)}")
+                details = write(temp_path)
+                os.replace(temp_path, file_path)
+                self.export_results.put(("done", file_path, label, details))
             except Exception as e:
-                messagebox.showerror("Error", f"Failed to save file: {str(e)}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                self.export_results.put(("error", file_path, label, str(e)))
+
+    def poll_exports(self):
+        while True:
+            try:
+                event = self.export_results.get_nowait()
+            except queue.Empty:
+                break
+
+            if event[0] == "started":
+                self.current_export = os.path.basename(event[1])
+                continue
+
+            self.pending_exports -= 1
+            self.current_export = None
+            kind, file_path, label, details = event
+            if kind == "done":
+                self.status_message.set(f"Saved as {label}: {os.path.basename(file_path)}{details}")
+            else:
+                messagebox.showerror("Error", f"Failed to save {os.path.basename(file_path)}: {details}")
                 self.status_message.set("Error saving file")
 
+        self.update_export_status()
+        if self.pending_exports:
+            self.root.after(self.progress_poll_interval, self.poll_exports)
+
+    def update_export_status(self):
+        if not self.pending_exports:
+            self.export_status.set("")
+        elif self.current_export:
+            self.export_status.set(f"Exporting {self.current_export} ({self.pending_exports} queued)")
+        else:
+            self.export_status.set(f"Exporting ({self.pending_exports} queued)")
+
     def save_as_png(self):
         if not self.displayed_image:
             messagebox.showinfo("No Image", "No image is currently loaded.")
@@ -757,13 +3669,53 @@ class HEICViewerApp:
         )
 
         if file_path:
-            try:
-                self.last_save_directory = os.path.dirname(file_path)
-                self.displayed_image.save(file_path, format='PNG')
-                self.status_message.set(f"Saved as PNG: {os.path.basename(file_path)}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save file: {str(e)}")
-                self.status_message.set("Error saving file")
+            self.last_save_directory = os.path.dirname(file_path)
+            image = self.displayed_image
+            params = encoder_params('PNG', self.encoder_preset.get())
+
+            def write(path):
+                image.save(path, format='PNG', **params)
+                return ""
+
+            self.queue_export(file_path, "PNG", write)
+
+    def save_orientation(self):
+        if not self.displayed_image or not self.current_file_path:
+            messagebox.showinfo("No Image", "No image is currently loaded.")
+            return
+
+        if self.net_orientation is None:
+            messagebox.showinfo("Save Orientation",
+                                "Only rotations and flips can be saved losslessly.\n"
+                                "Use Save As to keep the other edits.")
+            return
+
+        if self.net_orientation == 1:
+            self.status_message.set("Orientation unchanged; nothing to save")
+            return
+
+        if self.current_frame != 0:
+            messagebox.showinfo("Save Orientation", "Only the primary image of a file can be rotated losslessly.")
+            return
+
+        file_path = self.current_file_path
+        try:
+            orientation = rotate_file_losslessly(file_path, ORIENTATION_TRANSPOSES[self.net_orientation],
+                                                 self.applied_orientation)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save orientation: {str(e)}")
+            self.status_message.set("Error saving orientation")
+            return
+
+        # The file on disk now matches what is shown, so it becomes the new starting point for edits
+        self.original_image = self.displayed_image
+        self.heic_image = self.displayed_image
+        self.edit_history = []
+        self.edit_position = -1
+        self.net_orientation = 1
+        self.applied_orientation = orientation
+        self.current_metadata = self.metadata_service.get(file_path)
+        self.status_message.set(f"Saved orientation losslessly: {os.path.basename(file_path)}")
 
     def save_as_webp(self):
         if not self.displayed_image:
@@ -777,14 +3729,11 @@ class HEICViewerApp:
         )
 
         if file_path:
-            try:
-                self.last_save_directory = os.path.dirname(file_path)
-                quality = self.quality_value.get()
-                self.displayed_image.save(file_path, format='WEBP', quality=quality)
-                self.status_message.set(f"Saved as WebP: {os.path.basename(file_path)}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save file: {str(e)}")
-                self.status_message.set("Error saving file")
+            self.last_save_directory = os.path.dirname(file_path)
+            image = self.displayed_image
+            settings = self.lossy_settings()
+            self.queue_export(file_path, "WebP",
+                              lambda path: self.save_lossy(to_display(image), path, 'WEBP', *settings))
 
     def save_as_tiff(self):
         if not self.displayed_image:
@@ -798,13 +3747,15 @@ class HEICViewerApp:
         )
 
         if file_path:
-            try:
-                self.last_save_directory = os.path.dirname(file_path)
-                self.displayed_image.save(file_path, format='TIFF')
-                self.status_message.set(f"Saved as TIFF: {os.path.basename(file_path)}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save file: {str(e)}")
-                self.status_message.set("Error saving file")
+            self.last_save_directory = os.path.dirname(file_path)
+            image = self.displayed_image
+            params = encoder_params('TIFF', self.encoder_preset.get())
+
+            def write(path):
+                image.save(path, format='TIFF', **params)
+                return ""
+
+            self.queue_export(file_path, "TIFF", write)
 
     def save_as_bmp(self):
         if not self.displayed_image:
@@ -818,38 +3769,128 @@ class HEICViewerApp:
         )
 
         if file_path:
-            try:
-                self.last_save_directory = os.path.dirname(file_path)
-                self.displayed_image.save(file_path, format='BMP')
-                self.status_message.set(f"Saved as BMP: {os.path.basename(file_path)}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save file: {str(e)}")
-                self.status_message.set("Error saving file")
+            self.last_save_directory = os.path.dirname(file_path)
+            image = self.displayed_image
+
+            def write(path):
+                to_display(image).save(path, format='BMP')
+                return ""
+
+            self.queue_export(file_path, "BMP", write)
+
+    def save_as_gif(self):
+        if not self.displayed_image:
+            messagebox.showinfo("No Image", "No image is currently loaded.")
+            return
+
+        file_path = filedialog.asksaveasfilename(
+            initialdir=self.last_save_directory,
+            defaultextension=".gif",
+            filetypes=[("GIF files", "*.gif")]
+        )
+
+        if file_path:
+            self.last_save_directory = os.path.dirname(file_path)
+            image = self.displayed_image
+
+            def write(path):
+                to_display(image).save(path, format='GIF')
+                return ""
+
+            self.queue_export(file_path, "GIF", write)
+
+    def show_tiled_tiff_export(self):
+        if not self.displayed_image:
+            messagebox.showinfo("No Image", "No image is currently loaded.")
+            return
+
+        export_window = tk.Toplevel(self.root)
+        export_window.title("Export Tiled TIFF")
+        export_window.geometry("320x230")
+        export_window.resizable(False, False)
+        export_window.transient(self.root)
+        export_window.grab_set()
+
+        if self.is_dark_mode.get():
+            export_window.configure(bg=self.get_theme_color("bg"))
+
+        Label(export_window, text="Tiled TIFF Settings", font=("Helvetica", 12, "bold"),
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).pack(pady=10)
+
+        options_frame = Frame(export_window,
+                              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None)
+        options_frame.pack(fill=tk.X, padx=20, pady=5)
+
+        Label(options_frame, text="Tile size:",
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).grid(row=0, column=0, sticky=tk.W)
+
+        tile_menu = tk.OptionMenu(options_frame, self.tiff_tile_size, *TIFF_TILE_SIZES)
+        tile_menu.grid(row=0, column=1, sticky=tk.W, padx=5, pady=2)
+
+        Label(options_frame, text="Compression:",
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).grid(row=1, column=0, sticky=tk.W)
+
+        compression_menu = tk.OptionMenu(options_frame, self.tiff_compression, *TIFF_COMPRESSIONS)
+        compression_menu.grid(row=1, column=1, sticky=tk.W, padx=5, pady=2)
+
+        pyramid_check = tk.Checkbutton(export_window, text="Include reduced-resolution levels",
+                                       variable=self.tiff_pyramid,
+                                       bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+                                       fg=self.get_theme_color("text") if self.is_dark_mode.get() else None,
+                                       selectcolor=self.get_theme_color(
+                                           "button_bg") if self.is_dark_mode.get() else None)
+        pyramid_check.pack(padx=20, anchor=tk.W)
+
+        button_frame = Frame(export_window,
+                             bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None)
+        button_frame.pack(fill=tk.X, padx=20, pady=15)
+
+        def export():
+            file_path = filedialog.asksaveasfilename(
+                parent=export_window,
+                initialdir=self.last_save_directory,
+                defaultextension=".tiff",
+                filetypes=[("TIFF files", "*.tiff *.tif")]
+            )
+            if not file_path:
+                return
 
-    def save_as_gif(self):
-        if not self.displayed_image:
-            messagebox.showinfo("No Image", "No image is currently loaded.")
-            return
+            export_window.destroy()
+            self.last_save_directory = os.path.dirname(file_path)
+            image = self.displayed_image
+            tile_size = self.tiff_tile_size.get()
+            compression = self.tiff_compression.get()
+            pyramid = self.tiff_pyramid.get()
 
-        file_path = filedialog.asksaveasfilename(
-            initialdir=self.last_save_directory,
-            defaultextension=".gif",
-            filetypes=[("GIF files", "*.gif")]
+            def write(path):
+                write_tiled_tiff(path, image, tile_size, compression, pyramid)
+                return f" ({tile_size}px tiles, {compression})"
+
+            self.queue_export(file_path, "tiled TIFF", write)
+
+        export_button = tk.Button(
+            button_frame, text="Export...",
+            command=export,
+            bg=self.get_theme_color("button_bg") if self.is_dark_mode.get() else None,
+            fg=self.get_theme_color("text") if self.is_dark_mode.get() else None
         )
+        export_button.pack(side=tk.LEFT, padx=10)
 
-        if file_path:
-            try:
-                self.last_save_directory = os.path.dirname(file_path)
-                self.displayed_image.save(file_path, format='GIF')
-                self.status_message.set(f"Saved as GIF: {os.path.basename(file_path)}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save file: {str(e)}")
-                self.status_message.set("Error saving file")
+        cancel_button = tk.Button(
+            button_frame, text="Cancel",
+            command=export_window.destroy,
+            bg=self.get_theme_color("button_bg") if self.is_dark_mode.get() else None,
+            fg=self.get_theme_color("text") if self.is_dark_mode.get() else None
+        )
+        cancel_button.pack(side=tk.RIGHT, padx=10)
 
     def show_batch_dialog(self):
         batch_window = tk.Toplevel(self.root)
         batch_window.title("Batch Convert")
-        batch_window.geometry("400x300")
+        batch_window.geometry("400x575")
         batch_window.resizable(False, False)
         batch_window.transient(self.root)
         batch_window.grab_set()
@@ -859,10 +3900,15 @@ class HEICViewerApp:
 
         format_var = StringVar(value="jpg")
         quality_var = IntVar(value=self.quality_value.get())
+        target_var = IntVar(value=self.target_size_kb.get())
         resize_var = BooleanVar(value=False)
         width_var = IntVar(value=1920)
         height_var = IntVar(value=1080)
         maintain_aspect = BooleanVar(value=True)
+        report_var = BooleanVar(value=False)
+        dedup_var = BooleanVar(value=False)
+        frames_var = BooleanVar(value=False)
+        extra_outputs_var = StringVar(value="")
 
         Label(batch_window, text="Batch Convert Settings", font=("Helvetica", 14, "bold"),
               bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
@@ -904,6 +3950,17 @@ class HEICViewerApp:
                               troughcolor=self.get_theme_color("canvas_bg") if self.is_dark_mode.get() else None)
         quality_scale.pack(side=tk.RIGHT)
 
+        target_frame = Frame(batch_window,
+                             bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None)
+        target_frame.pack(fill=tk.X, padx=20, pady=5)
+
+        Label(target_frame, text="Target size KB (JPEG/WebP, 0 = off):",
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).pack(side=tk.LEFT)
+
+        target_entry = Entry(target_frame, textvariable=target_var, width=6)
+        target_entry.pack(side=tk.RIGHT)
+
         resize_frame = Frame(batch_window,
                              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None)
         resize_frame.pack(fill=tk.X, padx=20, pady=5)
@@ -940,17 +3997,94 @@ class HEICViewerApp:
                                           "button_bg") if self.is_dark_mode.get() else None)
         aspect_check.grid(row=2, column=0, columnspan=2, sticky=tk.W)
 
+        report_check = tk.Checkbutton(batch_window, text="Write timing report (JSON + CSV)", variable=report_var,
+                                      bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+                                      fg=self.get_theme_color("text") if self.is_dark_mode.get() else None,
+                                      selectcolor=self.get_theme_color(
+                                          "button_bg") if self.is_dark_mode.get() else None)
+        report_check.pack(padx=20, anchor=tk.W)
+
+        dedup_check = tk.Checkbutton(batch_window, text="Convert duplicate files only once", variable=dedup_var,
+                                     bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+                                     fg=self.get_theme_color("text") if self.is_dark_mode.get() else None,
+                                     selectcolor=self.get_theme_color(
+                                         "button_bg") if self.is_dark_mode.get() else None)
+        dedup_check.pack(padx=20, anchor=tk.W)
+
+        frames_check = tk.Checkbutton(batch_window, text="Export every image in multi-image HEIF files",
+                                      variable=frames_var,
+                                      bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+                                      fg=self.get_theme_color("text") if self.is_dark_mode.get() else None,
+                                      selectcolor=self.get_theme_color(
+                                          "button_bg") if self.is_dark_mode.get() else None)
+        frames_check.pack(padx=20, anchor=tk.W)
+
+        extra_frame = Frame(batch_window,
+                            bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None)
+        extra_frame.pack(fill=tk.X, padx=20, pady=5)
+
+        Label(extra_frame, text="Extra outputs:",
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).grid(row=0, column=0, sticky=tk.W)
+
+        extra_entry = Entry(extra_frame, textvariable=extra_outputs_var, width=30)
+        extra_entry.grid(row=0, column=1, sticky=tk.W, padx=5)
+
+        Label(extra_frame, text="format[:quality[:max size]], e.g. webp:85:2048, jpg:500kb:256",
+              font=("Helvetica", 8),
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).grid(row=1, column=0,
+                                                                                         columnspan=2, sticky=tk.W)
+
+        parallel_frame = Frame(batch_window,
+                               bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None)
+        parallel_frame.pack(fill=tk.X, padx=20, pady=5)
+
+        Label(parallel_frame, text="Parallel workers:",
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).grid(row=0, column=0, sticky=tk.W)
+
+        workers_entry = self.int_entry(parallel_frame, self.batch_workers)
+        workers_entry.grid(row=0, column=1, sticky=tk.W, padx=5)
+
+        Label(parallel_frame, text="Memory budget (MB):",
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).grid(row=1, column=0, sticky=tk.W)
+
+        budget_entry = self.int_entry(parallel_frame, self.batch_memory_budget_mb)
+        budget_entry.grid(row=1, column=1, sticky=tk.W, padx=5)
+
+        # Shared with the viewer: decoded images kept for quick back-and-forth navigation, applied immediately
+        Label(parallel_frame, text="Image cache (MB):",
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).grid(row=2, column=0, sticky=tk.W)
+
+        image_cache_entry = self.int_entry(parallel_frame, self.image_cache_mb)
+        image_cache_entry.grid(row=2, column=1, sticky=tk.W, padx=5)
+
+        def start_conversion():
+            try:
+                if self.batch_workers.get() < 1 or self.batch_memory_budget_mb.get() < 1:
+                    raise ValueError("Workers and memory budget must be positive values.")
+                size = (width_var.get(), height_var.get()) if resize_var.get() else None
+                target_bytes = target_var.get() * 1024 if target_var.get() > 0 else None
+                preset = self.encoder_preset.get()
+                output_specs = [make_output_spec(format_var.get(), quality_var.get(), size, maintain_aspect.get(),
+                                                 target_bytes=target_bytes, preset=preset)]
+                output_specs += parse_output_specs(extra_outputs_var.get(), quality_var.get(), preset)
+            except (ValueError, tk.TclError) as e:
+                messagebox.showerror("Invalid Settings", str(e), parent=batch_window)
+                return
+
+            self.batch_convert_files(output_specs, batch_window, report_var.get(), dedup_var.get(), frames_var.get())
+
         button_frame = Frame(batch_window,
                              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None)
         button_frame.pack(fill=tk.X, padx=20, pady=20)
 
         convert_button = tk.Button(
             button_frame, text="Convert Files",
-            command=lambda: self.batch_convert_files(
-                format_var.get(), quality_var.get(),
-                resize_var.get(), width_var.get(), height_var.get(),
-                maintain_aspect.get(), batch_window
-            ),
+            command=start_conversion,
             bg=self.get_theme_color("button_bg") if self.is_dark_mode.get() else None,
             fg=self.get_theme_color("text") if self.is_dark_mode.get() else None
         )
@@ -964,7 +4098,7 @@ class HEICViewerApp:
         )
         cancel_button.pack(side=tk.RIGHT, padx=10)
 
-    def batch_convert_files(self, target_format, quality, do_resize, width, height, maintain_aspect, dialog):
+    def batch_convert_files(self, output_specs, dialog, write_report=False, dedup=False, all_frames=False):
         file_paths = filedialog.askopenfilenames(
             initialdir=self.last_open_directory,
             filetypes=[
@@ -986,7 +4120,7 @@ class HEICViewerApp:
 
         progress_window = tk.Toplevel(self.root)
         progress_window.title("Converting...")
-        progress_window.geometry("400x100")
+        progress_window.geometry("400x160")
         progress_window.resizable(False, False)
         progress_window.transient(self.root)
         progress_window.grab_set()
@@ -994,57 +4128,539 @@ class HEICViewerApp:
         if self.is_dark_mode.get():
             progress_window.configure(bg=self.get_theme_color("bg"))
 
-        Label(progress_window, text="Converting files...",
+        phase_var = StringVar(value="Hashing files..." if dedup else "Converting files...")
+        Label(progress_window, textvariable=phase_var,
               bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
               fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).pack(pady=10)
 
         progress = ttk.Progressbar(progress_window, orient="horizontal", length=350, mode="determinate")
-        progress.pack(pady=10, padx=25)
+        progress.pack(pady=5, padx=25)
 
         progress["maximum"] = len(file_paths)
 
+        stats_var = StringVar(value=f"0/{len(file_paths)} files")
+        Label(progress_window, textvariable=stats_var,
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).pack(pady=5)
+
+        # Workers never touch Tk directly; they post events here and the Tk loop drains them.
+        progress_queue = queue.Queue()
+        cancel_event = Event()
+
+        cancel_button = tk.Button(
+            progress_window, text="Cancel",
+            command=cancel_event.set,
+            bg=self.get_theme_color("button_bg") if self.is_dark_mode.get() else None,
+            fg=self.get_theme_color("text") if self.is_dark_mode.get() else None
+        )
+        cancel_button.pack(pady=5)
+        progress_window.protocol("WM_DELETE_WINDOW", cancel_event.set)
+
         dialog.destroy()
 
+        workers = self.batch_workers.get()
+        output_stems = unique_output_stems(file_paths)
+        budget = MemoryBudget(self.batch_memory_budget_mb.get() * 1024 * 1024)
+
         def process_files():
+            records = []
+            errors = []
+            records_lock = Lock()
+
+            savings = {"duplicates": 0, "bytes": 0, "ms": 0.0}
+
+            def run_job(group, estimate):
+                try:
+                    # Jobs already queued in the executor are skipped once the batch is cancelled or has failed
+                    if cancel_event.is_set():
+                        return
+
+                    file_path = group[0]
+                    record = self.convert_batch_file(file_path, save_folder, output_specs, all_frames,
+                                                     output_stems[file_path])
+                    record["estimated_memory"] = estimate
+                    with records_lock:
+                        records.append(record)
+                    progress_queue.put(("file", record["bytes_in"], record["bytes_out"]))
+
+                    for duplicate in group[1:]:
+                        duplicate_name = output_stems[duplicate]
+                        for output in record["outputs"]:
+                            link_or_copy(output["path"], os.path.join(
+                                save_folder,
+                                f"{duplicate_name}{output['frame_suffix']}{output['suffix']}.{output['format']}"))
+
+                        with records_lock:
+                            savings["duplicates"] += 1
+                            savings["bytes"] += record["bytes_in"]
+                            savings["ms"] += record["total_ms"]
+                        progress_queue.put(("file", record["bytes_in"], record["bytes_out"]))
+                except Exception as e:
+                    errors.append(str(e))
+                    cancel_event.set()
+                finally:
+                    budget.release(estimate)
+
+            # Jobs are admitted in order by this single dispatcher, so a large file waiting for
+            # budget is never overtaken (and starved) by smaller files behind it.
             try:
-                for i, file_path in enumerate(file_paths):
-                    base_name = os.path.basename(file_path)
-                    file_name = os.path.splitext(base_name)[0]
-                    save_path = os.path.join(save_folder, f"{file_name}.{target_format}")
-
-                    img = Image.open(file_path)
-
-                    if do_resize:
-                        if maintain_aspect:
-                            img.thumbnail((width, height), Image.LANCZOS)
-                        else:
-                            img = img.resize((width, height), Image.LANCZOS)
-
-                    if target_format.lower() == "jpg":
-                        if img.mode == 'RGBA':
-                            rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-                            rgb_img.paste(img, mask=img.split()[3])
-                            rgb_img.save(save_path, format="JPEG", quality=quality)
-                        else:
-                            img.save(save_path, format="JPEG", quality=quality)
-                    elif target_format.lower() == "webp":
-                        img.save(save_path, format="WEBP", quality=quality)
-                    else:
-                        format_name = {"png": "PNG", "tiff": "TIFF", "bmp": "BMP"}
-                        img.save(save_path, format=format_name.get(target_format.lower(), target_format.upper()))
-
-                    progress["value"] = i + 1
-                    self.root.update_idletasks()
-
-                messagebox.showinfo("Batch Conversion", "Conversion completed successfully!", parent=progress_window)
-                self.status_message.set(f"Converted {len(file_paths)} files to {target_format.upper()}")
+                if dedup:
+                    hash_start = time.perf_counter()
+                    groups = group_duplicates(file_paths, workers, cancel_event)
+                    hash_ms = (time.perf_counter() - hash_start) * 1000
+                    progress_queue.put(("phase", "Converting files..."))
+                else:
+                    groups = [[file_path] for file_path in file_paths]
+
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    for group in groups:
+                        if cancel_event.is_set():
+                            break
+
+                        estimate = estimate_decode_memory(group[0])
+                        if not budget.acquire(estimate, cancel_event):
+                            break
+
+                        executor.submit(run_job, group, estimate)
             except Exception as e:
-                messagebox.showerror("Error", f"Error during batch conversion: {str(e)}", parent=progress_window)
+                errors.append(str(e))
+
+            if dedup and not errors:
+                progress_queue.put(("dedup", savings["duplicates"], savings["bytes"], savings["ms"], hash_ms))
+
+            if errors:
+                outcome = ("error", errors[0])
+            elif cancel_event.is_set():
+                outcome = ("cancelled",)
+            else:
+                outcome = ("done",)
+
+            if write_report and records:
+                try:
+                    summary = write_batch_report(save_folder, records)
+                    progress_queue.put(("report", summary))
+                except Exception as e:
+                    progress_queue.put(("report_error", str(e)))
+
+            progress_queue.put(outcome)
+
+        totals = {"done": 0, "bytes_in": 0, "bytes_out": 0, "report": None, "dedup": None}
+        start_time = time.monotonic()
+
+        def poll_progress():
+            finished = None
+            while True:
+                try:
+                    event = progress_queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if event[0] == "file":
+                    totals["done"] += 1
+                    totals["bytes_in"] += event[1]
+                    totals["bytes_out"] += event[2]
+                elif event[0] == "report":
+                    totals["report"] = self.format_batch_summary(event[1])
+                elif event[0] == "report_error":
+                    totals["report"] = f"Could not write timing report: {event[1]}"
+                elif event[0] == "phase":
+                    phase_var.set(event[1])
+                elif event[0] == "dedup":
+                    totals["dedup"] = (f"Skipped {event[1]} duplicate file(s): "
+                                       f"{self.format_file_size(event[2])} not decoded, "
+                                       f"~{event[3] / 1000:.1f} s of conversion saved "
+                                       f"(hashing took {event[4] / 1000:.1f} s)")
+                else:
+                    finished = event
+
+            done = totals["done"]
+            elapsed = time.monotonic() - start_time
+            rate = done / elapsed if elapsed > 0 else 0.0
+
+            if rate > 0:
+                eta = self.format_duration((len(file_paths) - done) / rate)
+            else:
+                eta = "--:--"
+
+            progress["value"] = done
+            stats_var.set(f"{done}/{len(file_paths)} files | "
+                          f"{self.format_file_size(totals['bytes_in'])} in, "
+                          f"{self.format_file_size(totals['bytes_out'])} out\n"
+                          f"{rate:.1f} files/s | ETA {eta}")
+
+            if cancel_event.is_set() and finished is None:
+                cancel_button.config(state=tk.DISABLED, text="Cancelling...")
+
+            if finished is None:
+                self.root.after(self.progress_poll_interval, poll_progress)
+                return
+
+            if finished[0] == "done":
+                message = "Conversion completed successfully!"
+                if totals["dedup"]:
+                    message += f"\n\n{totals['dedup']}"
+                if totals["report"]:
+                    message += f"\n\n{totals['report']}"
+                messagebox.showinfo("Batch Conversion", message, parent=progress_window)
+                formats = ", ".join(sorted({spec["format"].upper() for spec in output_specs}))
+                self.status_message.set(f"Converted {done} files to {formats}")
+            elif finished[0] == "cancelled":
+                self.status_message.set(f"Batch conversion cancelled after {done} of {len(file_paths)} files")
+            else:
+                messagebox.showerror("Error", f"Error during batch conversion: {finished[1]}", parent=progress_window)
                 self.status_message.set("Error during batch conversion")
-            finally:
-                progress_window.destroy()
 
-        Thread(target=process_files).start()
+            progress_window.destroy()
+
+        Thread(target=process_files, daemon=True).start()
+        self.root.after(self.progress_poll_interval, poll_progress)
+
+    def convert_batch_file(self, file_path, save_folder, output_specs, all_frames=False, file_name=None):
+        file_name = file_name or os.path.splitext(os.path.basename(file_path))[0]
+
+        record = {"file": file_path, "bytes_in": os.path.getsize(file_path), "outputs": []}
+        for stage in BATCH_STAGES:
+            record[f"{stage}_ms"] = 0.0
+
+        img = open_image(file_path)
+        frame_count = getattr(img, "n_frames", 1) if all_frames else 1
+
+        # Frames are decoded one at a time, so a burst never needs more memory than a single image
+        for frame_index in range(frame_count):
+            # Image.open only parses the header, so force the pixel decode here to time it on its own.
+            stage_start = time.perf_counter()
+            if frame_index:
+                img.seek(frame_index)
+            img.load()
+            # Outputs carry no EXIF, so the orientation has to be baked into the pixels
+            frame = apply_exif_orientation(img)
+            record["decode_ms"] += (time.perf_counter() - stage_start) * 1000
+
+            frame_suffix = f"_{frame_index + 1}" if frame_count > 1 else ""
+            self.encode_batch_outputs(frame, f"{file_name}{frame_suffix}", save_folder, output_specs, record,
+                                      frame_suffix)
+
+        record["output_count"] = len(record["outputs"])
+        record["trial_encodes"] = sum(output["trial_encodes"] for output in record["outputs"])
+        record["bytes_out"] = sum(output["bytes"] for output in record["outputs"])
+        record["total_ms"] = sum(record[f"{stage}_ms"] for stage in BATCH_STAGES)
+        return record
+
+    def encode_batch_outputs(self, img, file_name, save_folder, output_specs, record, frame_suffix=""):
+        # Produce the largest outputs first so each smaller size is derived from the previous
+        # (aspect-preserving) resize rather than from the full-size decode.
+        targets = sorted(((output_target_size(img.size, spec), spec) for spec in output_specs),
+                         key=lambda item: item[0][0] * item[0][1], reverse=True)
+        sources = [img]
+
+        for target_size, spec in targets:
+            save_path = os.path.join(save_folder, f"{file_name}{spec['suffix']}.{spec['format']}")
+
+            stage_start = time.perf_counter()
+            source = img
+            for candidate in sources:
+                if candidate.width >= target_size[0] and candidate.height >= target_size[1]:
+                    source = candidate
+            if source.size != target_size:
+                resized = source.resize(target_size, Image.LANCZOS)
+                if spec["maintain_aspect"]:
+                    sources.append(resized)
+            else:
+                resized = source
+            resize_ms = (time.perf_counter() - stage_start) * 1000
+
+            stage_start = time.perf_counter()
+            out_img = resized
+            if spec["format"] == "jpg" and out_img.mode == 'RGBA':
+                out_img = Image.new('RGB', resized.size, (255, 255, 255))
+                out_img.paste(resized, mask=resized.split()[3])
+            convert_ms = (time.perf_counter() - stage_start) * 1000
+
+            stage_start = time.perf_counter()
+            format_name = BATCH_FORMATS.get(spec["format"], spec["format"].upper())
+            params = encoder_params(format_name, spec["preset"])
+            quality = spec["quality"]
+            trials = 1
+            if spec["format"] in ("jpg", "webp") and spec["target_bytes"]:
+                data, quality, trials, _ = encode_to_target_size(out_img, format_name, spec["target_bytes"],
+                                                                 **params)
+                with open(save_path, 'wb') as f:
+                    f.write(data)
+            elif spec["format"] in ("jpg", "webp"):
+                out_img.save(save_path, format=format_name, quality=quality, **params)
+            else:
+                out_img.save(save_path, format=format_name, **params)
+            encode_ms = (time.perf_counter() - stage_start) * 1000
+
+            record["resize_ms"] += resize_ms
+            record["convert_ms"] += convert_ms
+            record["encode_ms"] += encode_ms
+            record["outputs"].append({
+                "path": save_path,
+                "format": spec["format"],
+                "suffix": spec["suffix"],
+                "frame_suffix": frame_suffix,
+                "width": out_img.width,
+                "height": out_img.height,
+                "bytes": os.path.getsize(save_path),
+                "quality": quality,
+                "preset": spec["preset"],
+                "trial_encodes": trials,
+                "resize_ms": resize_ms,
+                "convert_ms": convert_ms,
+                "encode_ms": encode_ms
+            })
+
+    def format_batch_summary(self, summary):
+        lines = ["Stage timings (p50 / p95 / max):"]
+        for stage in BATCH_STAGES + ("total",):
+            stats = summary[f"{stage}_ms"]
+            lines.append(f"  {stage.capitalize()}: {stats['p50']:.0f} / {stats['p95']:.0f} / {stats['max']:.0f} ms")
+        lines.append("Report written to batch_report.json and batch_report.csv")
+        return "\n".join(lines)
+
+    def run_benchmark(self):
+        file_paths = filedialog.askopenfilenames(
+            initialdir=self.last_open_directory,
+            filetypes=[
+                ("Image files", "*.heic *.HEIC *.heif *.HEIF *.jpg *.jpeg *.JPG *.JPEG *.png *.PNG")
+            ]
+        )
+
+        if not file_paths:
+            return
+
+        result = {}
+        quality = self.quality_value.get()
+
+        def benchmark():
+            try:
+                result["table"] = format_benchmark_table(run_encoder_benchmark(file_paths, quality), len(file_paths))
+            except Exception as e:
+                result["error"] = str(e)
+
+        def check_finished():
+            if worker.is_alive():
+                self.root.after(self.progress_poll_interval, check_finished)
+                return
+
+            if "error" in result:
+                messagebox.showerror("Error", f"Benchmark failed: {result['error']}")
+                self.status_message.set("Benchmark failed")
+                return
+
+            self.status_message.set("Benchmark finished")
+            self.show_text_window("Encoder Benchmark", result["table"])
+
+        self.status_message.set(f"Benchmarking encoder presets on {len(file_paths)} file(s)...")
+        worker = Thread(target=benchmark, daemon=True)
+        worker.start()
+        self.root.after(self.progress_poll_interval, check_finished)
+
+    def show_lossless_rotate(self):
+        rotate_window = tk.Toplevel(self.root)
+        rotate_window.title("Lossless Rotate Files")
+        rotate_window.geometry("300x150")
+        rotate_window.resizable(False, False)
+        rotate_window.transient(self.root)
+        rotate_window.grab_set()
+
+        if self.is_dark_mode.get():
+            rotate_window.configure(bg=self.get_theme_color("bg"))
+
+        Label(rotate_window, text="Rewrite orientation only (JPEG, TIFF, HEIF)",
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).pack(pady=10)
+
+        operation_var = StringVar(value=next(iter(LOSSLESS_OPERATIONS)))
+        operation_menu = tk.OptionMenu(rotate_window, operation_var, *LOSSLESS_OPERATIONS)
+        operation_menu.pack(pady=5)
+
+        button_frame = Frame(rotate_window,
+                             bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None)
+        button_frame.pack(fill=tk.X, padx=20, pady=10)
+
+        def choose_files():
+            file_paths = filedialog.askopenfilenames(
+                parent=rotate_window,
+                initialdir=self.last_open_directory,
+                filetypes=[
+                    ("Image files", "*.heic *.HEIC *.heif *.HEIF *.jpg *.jpeg *.JPG *.JPEG *.tif *.tiff *.TIF *.TIFF")
+                ]
+            )
+            if not file_paths:
+                return
+
+            operation = operation_var.get()
+            rotate_window.destroy()
+            self.rotate_files_losslessly(file_paths, operation)
+
+        choose_button = tk.Button(
+            button_frame, text="Choose Files...",
+            command=choose_files,
+            bg=self.get_theme_color("button_bg") if self.is_dark_mode.get() else None,
+            fg=self.get_theme_color("text") if self.is_dark_mode.get() else None
+        )
+        choose_button.pack(side=tk.LEFT, padx=10)
+
+        cancel_button = tk.Button(
+            button_frame, text="Cancel",
+            command=rotate_window.destroy,
+            bg=self.get_theme_color("button_bg") if self.is_dark_mode.get() else None,
+            fg=self.get_theme_color("text") if self.is_dark_mode.get() else None
+        )
+        cancel_button.pack(side=tk.RIGHT, padx=10)
+
+    def rotate_files_losslessly(self, file_paths, operation):
+        method = LOSSLESS_OPERATIONS[operation]
+        progress = queue.Queue()
+        errors = []
+
+        def rotate_all():
+            for index, file_path in enumerate(file_paths):
+                try:
+                    rotate_file_losslessly(file_path, method)
+                except Exception as e:
+                    errors.append(f"{os.path.basename(file_path)}: {str(e)}")
+                progress.put(index + 1)
+
+        def check_finished():
+            done = 0
+            while not progress.empty():
+                done = progress.get_nowait()
+            if done:
+                self.status_message.set(f"{operation}: {done}/{len(file_paths)} files")
+
+            if worker.is_alive():
+                self.root.after(self.progress_poll_interval, check_finished)
+                return
+
+            rotated = len(file_paths) - len(errors)
+            self.status_message.set(f"{operation}: {rotated} file(s) rewritten losslessly")
+            if errors:
+                messagebox.showwarning("Lossless Rotate", f"{len(errors)} file(s) were not changed:\n\n" +
+                                       "\n".join(errors[:10]))
+            if self.current_file_path in file_paths:
+                self.load_image_async(self.current_file_path, self.current_frame)
+
+        worker = Thread(target=rotate_all, daemon=True)
+        worker.start()
+        self.root.after(self.progress_poll_interval, check_finished)
+
+    def show_metadata_export(self):
+        root_dir = filedialog.askdirectory(initialdir=self.last_open_directory, title="Directory to export")
+        if not root_dir:
+            return
+
+        output_path = filedialog.asksaveasfilename(
+            initialdir=self.last_save_directory,
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl")]
+        )
+        if not output_path:
+            return
+
+        self.last_save_directory = os.path.dirname(output_path)
+        output_format = "jsonl" if output_path.lower().endswith(".jsonl") else "csv"
+
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title("Exporting Metadata...")
+        progress_window.geometry("360x120")
+        progress_window.resizable(False, False)
+        progress_window.transient(self.root)
+
+        if self.is_dark_mode.get():
+            progress_window.configure(bg=self.get_theme_color("bg"))
+
+        count_var = StringVar(value="Scanning...")
+        Label(progress_window, textvariable=count_var,
+              bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None,
+              fg=self.get_theme_color("text") if self.is_dark_mode.get() else None).pack(pady=15)
+
+        progress_queue = queue.Queue()
+        cancel_event = Event()
+
+        tk.Button(
+            progress_window, text="Cancel",
+            command=cancel_event.set,
+            bg=self.get_theme_color("button_bg") if self.is_dark_mode.get() else None,
+            fg=self.get_theme_color("text") if self.is_dark_mode.get() else None
+        ).pack(pady=5)
+        progress_window.protocol("WM_DELETE_WINDOW", cancel_event.set)
+
+        workers = max(1, self.batch_workers.get())
+
+        def export():
+            try:
+                files, errors = export_directory_metadata(
+                    root_dir, output_path, output_format, workers,
+                    lambda done, failed: progress_queue.put(("progress", done, failed)), cancel_event)
+                progress_queue.put(("done", files, errors))
+            except Exception as e:
+                progress_queue.put(("error", str(e)))
+
+        def poll_progress():
+            finished = None
+            while True:
+                try:
+                    event = progress_queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if event[0] == "progress":
+                    count_var.set(f"{event[1]} files exported ({event[2]} unreadable)")
+                else:
+                    finished = event
+
+            if finished is None:
+                self.root.after(self.progress_poll_interval, poll_progress)
+                return
+
+            progress_window.destroy()
+            if finished[0] == "error":
+                messagebox.showerror("Error", f"Metadata export failed: {finished[1]}")
+                self.status_message.set("Error exporting metadata")
+            else:
+                state = "cancelled" if cancel_event.is_set() else "finished"
+                self.status_message.set(f"Metadata export {state}: {finished[1]} files written to "
+                                        f"{os.path.basename(output_path)}")
+
+        Thread(target=export, daemon=True).start()
+        self.root.after(self.progress_poll_interval, poll_progress)
+
+    def show_text_window(self, title, text):
+        text_window = tk.Toplevel(self.root)
+        text_window.title(title)
+        text_window.geometry("500x400")
+        text_window.transient(self.root)
+
+        if self.is_dark_mode.get():
+            text_window.configure(bg=self.get_theme_color("bg"))
+
+        text_frame = Frame(text_window,
+                           bg=self.get_theme_color("bg") if self.is_dark_mode.get() else None)
+        text_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        text_bg = self.get_theme_color("canvas_bg") if self.is_dark_mode.get() else "#FFFFFF"
+        text_fg = self.get_theme_color("text") if self.is_dark_mode.get() else "#000000"
+
+        text_widget = tk.Text(text_frame, bg=text_bg, fg=text_fg, font=("Courier", 10), wrap=tk.NONE)
+        scroll = Scrollbar(text_frame, command=text_widget.yview)
+        text_widget.configure(yscrollcommand=scroll.set)
+
+        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        text_widget.insert(tk.END, text)
+        text_widget.config(state=tk.DISABLED)
+
+        close_button = tk.Button(
+            text_window, text="Close",
+            command=text_window.destroy,
+            bg=self.get_theme_color("button_bg") if self.is_dark_mode.get() else None,
+            fg=self.get_theme_color("text") if self.is_dark_mode.get() else None
+        )
+        close_button.pack(pady=10)
 
     def on_mousewheel(self, event):
         if event.state & 0x4:  # Check if Ctrl key is pressed
@@ -1189,8 +4805,8 @@ class HEICViewerApp:
         if not self.displayed_image:
             return
 
-        self.add_to_history()
-        self.displayed_image = self.displayed_image.rotate(90, expand=True)
+        self.add_to_history(Image.ROTATE_90)
+        self.displayed_image = self.displayed_image.transpose(Image.ROTATE_90)
         self.rotation_angle = (self.rotation_angle + 90) % 360
         self.update_image()
 
@@ -1200,8 +4816,8 @@ class HEICViewerApp:
         if not self.displayed_image:
             return
 
-        self.add_to_history()
-        self.displayed_image = self.displayed_image.rotate(-90, expand=True)
+        self.add_to_history(Image.ROTATE_270)
+        self.displayed_image = self.displayed_image.transpose(Image.ROTATE_270)
         self.rotation_angle = (self.rotation_angle - 90) % 360
         self.update_image()
 
@@ -1211,8 +4827,8 @@ class HEICViewerApp:
         if not self.displayed_image:
             return
 
-        self.add_to_history()
-        self.displayed_image = ImageOps.mirror(self.displayed_image)
+        self.add_to_history(Image.FLIP_LEFT_RIGHT)
+        self.displayed_image = self.displayed_image.transpose(Image.FLIP_LEFT_RIGHT)
         self.update_image()
 
         self.status_message.set("Flipped horizontally")
@@ -1221,8 +4837,8 @@ class HEICViewerApp:
         if not self.displayed_image:
             return
 
-        self.add_to_history()
-        self.displayed_image = ImageOps.flip(self.displayed_image)
+        self.add_to_history(Image.FLIP_TOP_BOTTOM)
+        self.displayed_image = self.displayed_image.transpose(Image.FLIP_TOP_BOTTOM)
         self.update_image()
 
         self.status_message.set("Flipped vertically")
@@ -1352,6 +4968,7 @@ class HEICViewerApp:
 
         self.add_to_history()
         self.displayed_image = self.original_image.copy()
+        self.net_orientation = 1
         self.brightness_value.set(1.0)
         self.contrast_value.set(1.0)
         self.sharpness_value.set(1.0)
@@ -1359,7 +4976,8 @@ class HEICViewerApp:
 
         self.status_message.set("Image reset to original")
 
-    def add_to_history(self):
+    def add_to_history(self, orientation_method=None):
+        # Every edit except a rotation or flip means the result can no longer be saved as a tag change
         if not self.displayed_image:
             return
 
@@ -1371,14 +4989,19 @@ class HEICViewerApp:
         else:
             self.edit_position += 1
 
-        self.edit_history.append(self.displayed_image.copy())
+        self.edit_history.append((self.displayed_image.copy(), self.net_orientation))
+        if orientation_method is not None and self.net_orientation is not None:
+            self.net_orientation = compose_orientation(self.net_orientation, orientation_method)
+        else:
+            self.net_orientation = None
 
     def undo(self):
         if not self.displayed_image or self.edit_position <= 0:
             return
 
         self.edit_position -= 1
-        self.displayed_image = self.edit_history[self.edit_position].copy()
+        image, self.net_orientation = self.edit_history[self.edit_position]
+        self.displayed_image = image.copy()
         self.update_image()
 
         self.status_message.set("Undo")
@@ -1388,7 +5011,8 @@ class HEICViewerApp:
             return
 
         self.edit_position += 1
-        self.displayed_image = self.edit_history[self.edit_position].copy()
+        image, self.net_orientation = self.edit_history[self.edit_position]
+        self.displayed_image = image.copy()
         self.update_image()
 
         self.status_message.set("Redo")
@@ -1403,6 +5027,12 @@ class HEICViewerApp:
             brightness = self.brightness_value.get()
             contrast = self.contrast_value.get()
             sharpness = self.sharpness_value.get()
+            self.net_orientation = 1 if brightness == contrast == sharpness == 1.0 else None
+
+            if isinstance(self.displayed_image, HighBitImage):
+                self.displayed_image = self.displayed_image.adjusted(brightness, contrast, sharpness)
+                self.update_image()
+                return
 
             if brightness != 1.0:
                 enhancer = ImageEnhance.Brightness(self.displayed_image)
@@ -1503,10 +5133,11 @@ class HEICViewerApp:
             return
 
         self.add_to_history()
+        high_bit = isinstance(self.displayed_image, HighBitImage)
         self.displayed_image = ImageOps.grayscale(self.displayed_image.convert("RGB"))
         self.update_image()
 
-        self.status_message.set("Applied Grayscale filter")
+        self.status_message.set("Applied Grayscale filter" + (" (reduced to 8-bit)" if high_bit else ""))
 
     def filter_sepia(self):
         if not self.displayed_image:
@@ -1514,6 +5145,7 @@ class HEICViewerApp:
 
         self.add_to_history()
 
+        high_bit = isinstance(self.displayed_image, HighBitImage)
         img = self.displayed_image.convert("RGB")
         sepia_palette = []
         r, g, b = (239, 224, 185)
@@ -1525,7 +5157,7 @@ class HEICViewerApp:
         self.displayed_image = ImageOps.colorize(grayscale, "#000", "#fff")
 
         self.update_image()
-        self.status_message.set("Applied Sepia filter")
+        self.status_message.set("Applied Sepia filter" + (" (reduced to 8-bit)" if high_bit else ""))
 
     def toggle_theme(self):
         self.is_dark_mode.set(not self.is_dark_mode.get())
@@ -1540,7 +5172,7 @@ class HEICViewerApp:
             return
 
         try:
-            img = Image.open(self.current_file_path)
+            metadata = self.metadata_service.get(self.current_file_path)
 
             metadata_window = tk.Toplevel(self.root)
             metadata_window.title("Image Metadata")
@@ -1572,30 +5204,28 @@ class HEICViewerApp:
             text_widget.config(yscrollcommand=scroll.set)
 
             text_widget.insert(tk.END, f"Filename: {os.path.basename(self.current_file_path)}\n")
-            text_widget.insert(tk.END, f"Format: {img.format}\n")
-            text_widget.insert(tk.END, f"Mode: {img.mode}\n")
-            text_widget.insert(tk.END, f"Size: {img.width} x {img.height}\n")
-
-            try:
-                size = os.path.getsize(self.current_file_path)
-                text_widget.insert(tk.END, f"File Size: {self.format_file_size(size)}\n")
-            except:
-                pass
+            text_widget.insert(tk.END, f"Format: {metadata['format']}\n")
+            text_widget.insert(tk.END, f"Mode: {metadata['mode']}\n")
+            text_widget.insert(tk.END, f"Size: {metadata['width']} x {metadata['height']}\n")
+            text_widget.insert(tk.END, f"File Size: {self.format_file_size(metadata['file_size'])}\n")
+            if metadata["frames"] > 1:
+                text_widget.insert(tk.END, f"Images in Container: {metadata['frames']}\n")
+
+            if metadata["icc"]:
+                icc = metadata["icc"]
+                text_widget.insert(tk.END, f"ICC Profile: {icc['color_space']} {icc['device_class']} v{icc['version']} "
+                                           f"({self.format_file_size(icc['size'])})\n")
 
             text_widget.insert(tk.END, "\nEXIF Data:\n")
 
-            try:
-                exif = img.getexif()
-                if exif:
-                    for tag_id, value in exif.items():
-                        tag = ExifTags.TAGS.get(tag_id, tag_id)
-                        if isinstance(value, bytes):
-                            value = value.hex()
-                        text_widget.insert(tk.END, f"{tag}: {value}\n")
-                else:
-                    text_widget.insert(tk.END, "No EXIF data found.\n")
-            except Exception as e:
-                text_widget.insert(tk.END, f"Error reading EXIF data: {str(e)}\n")
+            if metadata["exif"]:
+                for tag, value in metadata["exif"]:
+                    text_widget.insert(tk.END, f"{tag}: {value}\n")
+            else:
+                text_widget.insert(tk.END, "No EXIF data found.\n")
+
+            if metadata["xmp"]:
+                text_widget.insert(tk.END, f"\nXMP Data:\n{metadata['xmp']}\n")
 
             text_widget.config(state=tk.DISABLED)
 
@@ -1639,15 +5269,12 @@ class HEICViewerApp:
         width, height = self.displayed_image.size
         mode = self.displayed_image.mode
 
-        try:
-            file_size = os.path.getsize(self.current_file_path)
-            size_str = self.format_file_size(file_size)
-        except:
-            size_str = "Unknown"
+        metadata = self.current_metadata or {}
+        size_str = self.format_file_size(metadata["file_size"]) if metadata else "Unknown"
 
         info = [
             ("Filename", os.path.basename(self.current_file_path) if self.current_file_path else "Untitled"),
-            ("Format", self.heic_image.format if self.heic_image and self.heic_image.format else "Unknown"),
+            ("Format", metadata.get("format") or "Unknown"),
             ("Dimensions", f"{width} x {height} pixels"),
             ("Resolution", f"{width * height} pixels"),
             ("Color Mode", mode),
@@ -1716,14 +5343,29 @@ class HEICViewerApp:
                 return f"{w}:{h}"
         return "Unknown"
 
+    def show_thumbnail_browser(self):
+        if not self.directory_files:
+            messagebox.showinfo("No Directory", "Please open an image file first to scan its directory.")
+            return
+
+        if not self.thumbnail_cache:
+            messagebox.showerror("Error", "The thumbnail cache directory is not available.")
+            return
+
+        if not self.thumbnail_executor:
+            self.thumbnail_executor = ThreadPoolExecutor(max_workers=max(1, self.batch_workers.get()))
+            # Trim the on-disk cache once per session before it starts growing again
+            self.thumbnail_executor.submit(self.thumbnail_cache.cleanup)
+
+        ThumbnailBrowser(self, self.directory_files)
+
     def toggle_slideshow(self):
         if not self.directory_files:
             messagebox.showinfo("No Directory", "Please open an image file first to scan its directory.")
             return
 
         if self.is_slideshow_active:
-            self.is_slideshow_active = False
-            self.status_message.set("Slideshow stopped")
+            self.stop_slideshow()
             return
 
         slideshow_settings = tk.Toplevel(self.root)
@@ -1760,9 +5402,7 @@ class HEICViewerApp:
 
         def start_slideshow():
             slideshow_settings.destroy()
-            self.is_slideshow_active = True
-            self.status_message.set("Slideshow started")
-            self.run_slideshow()
+            self.start_slideshow()
 
         start_button = tk.Button(
             button_frame, text="Start",
@@ -1780,14 +5420,137 @@ class HEICViewerApp:
         )
         cancel_button.pack(side=tk.RIGHT, padx=10)
 
-    def run_slideshow(self):
-        if not self.is_slideshow_active:
+    def start_slideshow(self):
+        if self.slideshow_executor is None:
+            self.slideshow_executor = ThreadPoolExecutor(max_workers=self.slideshow_prefetch_count)
+
+        self.is_slideshow_active = True
+        self.slideshow_generation += 1
+        self.slideshow_stats = {"shown": 0, "late": 0, "max_late_ms": 0.0}
+
+        # Every slide is due at start + n * delay, so late frames never push the rest of the show back
+        self.slideshow_start = time.monotonic()
+        self.slideshow_tick = 0
+
+        self.prefetch_slides()
+        self.schedule_slideshow_tick()
+        self.status_message.set("Slideshow started")
+
+    def stop_slideshow(self):
+        self.is_slideshow_active = False
+        self.slideshow_generation += 1
+        if self.slideshow_job:
+            self.root.after_cancel(self.slideshow_job)
+            self.slideshow_job = None
+        for future in self.slideshow_prefetch.values():
+            future.cancel()
+        self.slideshow_prefetch = {}
+
+        stats = self.slideshow_stats
+        self.status_message.set(
+            f"Slideshow stopped: {stats.get('shown', 0)} slides, {stats.get('late', 0)} late "
+            f"(worst {stats.get('max_late_ms', 0.0):.0f} ms)"
+        )
+
+    def upcoming_slides(self):
+        if not self.directory_files:
+            return []
+
+        count = min(self.slideshow_prefetch_count, len(self.directory_files))
+        start = self.current_directory_index
+        return [self.directory_files[(start + offset) % len(self.directory_files)] for offset in range(1, count + 1)]
+
+    def prefetch_slides(self):
+        canvas_size = (self.canvas.winfo_width(), self.canvas.winfo_height())
+        high_bit_depth = self.high_bit_depth.get()
+        upcoming = self.upcoming_slides()
+
+        for path in list(self.slideshow_prefetch):
+            if path not in upcoming:
+                self.slideshow_prefetch.pop(path).cancel()
+
+        for path in upcoming:
+            if path not in self.slideshow_prefetch:
+                self.slideshow_prefetch[path] = self.slideshow_executor.submit(self.prepare_slide, path, canvas_size,
+                                                                            high_bit_depth)
+
+    def prepare_slide(self, file_path, canvas_size, high_bit_depth=False):
+        img = self.load_frame(file_path, 0, high_bit_depth)
+
+        canvas_width, canvas_height = canvas_size
+        if canvas_width > 1 and canvas_height > 1:
+            zoom = max(canvas_width / img.width, canvas_height / img.height)
+        else:
+            zoom = 1.0
+        size = (max(1, int(img.width * zoom)), max(1, int(img.height * zoom)))
+
+        return {
+            "image": img,
+            "scaled": to_display(img.resize(size, Image.LANCZOS)),
+            "zoom": zoom,
+            "metadata": self.metadata_service.get(file_path),
+        }
+
+    def schedule_slideshow_tick(self):
+        self.slideshow_tick += 1
+        deadline = self.slideshow_start + self.slideshow_tick * self.slideshow_delay.get()
+        delay_ms = max(0, int((deadline - time.monotonic()) * 1000))
+        self.slideshow_job = self.root.after(delay_ms, self.run_slideshow, self.slideshow_generation, deadline)
+
+    def run_slideshow(self, generation, deadline):
+        self.slideshow_job = None
+        if not self.is_slideshow_active or generation != self.slideshow_generation:
             return
 
-        self.next_image()
+        upcoming = self.upcoming_slides()
+        if not upcoming:
+            self.stop_slideshow()
+            return
+
+        path = upcoming[0]
+        if path not in self.slideshow_prefetch:
+            self.prefetch_slides()
+        future = self.slideshow_prefetch[path]
+
+        if not future.done():
+            self.slideshow_job = self.root.after(10, self.run_slideshow, generation, deadline)
+            return
+        del self.slideshow_prefetch[path]
 
-        delay_ms = self.slideshow_delay.get() * 1000
-        self.root.after(delay_ms, self.run_slideshow)
+        late_ms = (time.monotonic() - deadline) * 1000
+        if late_ms > self.slideshow_late_tolerance_ms:
+            self.slideshow_stats["late"] += 1
+            self.slideshow_stats["max_late_ms"] = max(self.slideshow_stats["max_late_ms"], late_ms)
+
+        try:
+            self.show_slide(path, future.result())
+            self.slideshow_stats["shown"] += 1
+        except Exception as e:
+            # Step past the unreadable file so the next tick moves on; the watcher may already have dropped it
+            if path in self.directory_files:
+                self.current_directory_index = self.directory_files.index(path)
+            self.status_message.set(f"Slideshow skipped {os.path.basename(path)}: {e}")
+
+        self.prefetch_slides()
+        self.schedule_slideshow_tick()
+
+    def show_slide(self, file_path, slide):
+        self.open_generation += 1
+        self.current_file_path = file_path
+        self.current_directory_index = self.directory_files.index(file_path)
+
+        # Edits always build new images, so the three working references can share the decoded slide
+        self.original_image = self.heic_image = self.displayed_image = slide["image"]
+        self.current_metadata = slide["metadata"]
+        self.current_frame = 0
+        self.reset_image_state()
+        self.applied_orientation = getattr(slide["image"], "info", {}).get("applied_orientation")
+        self.zoom_level = slide["zoom"]
+
+        self.show_photo(slide["scaled"])
+        self.update_image_info()
+        self.schedule_histogram()
+        self.status_message.set(f"Slideshow: {os.path.basename(file_path)}")
 
     def previous_image(self):
         if not self.directory_files or self.current_directory_index <= 0:
@@ -1823,6 +5586,8 @@ class HEICViewerApp:
             self.update_recent_files_menu()
 
             self.directory_files.remove(self.current_file_path)
+            if self.current_file_path in self.all_directory_files:
+                self.all_directory_files.remove(self.current_file_path)
 
             if not self.directory_files:
                 self.current_file_path = None
@@ -1893,7 +5658,7 @@ class HEICViewerApp:
             return
 
         try:
-            self.displayed_image.save("temp_clipboard.png", format="PNG")
+            to_display(self.displayed_image).save("temp_clipboard.png", format="PNG")
             img = ImageTk.PhotoImage(file="temp_clipboard.png")
             self.root.clipboard_clear()
             self.root.clipboard_append(img)
@@ -1997,6 +5762,7 @@ class HEICViewerApp:
                 ("Ctrl+W", "Fit to Window"),
                 ("Ctrl+1", "Actual Size"),
                 ("F11", "Toggle Full Screen"),
+                ("Ctrl+G", "Thumbnail Browser"),
                 ("Ctrl+T", "Toggle Theme")
             ]),
             ("Tools", [
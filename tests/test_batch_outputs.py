@@ -0,0 +1,60 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HEICViewerApp as app
+
+
+def test_parse_output_specs_names_each_output():
+    specs = app.parse_output_specs("webp:85:2048, jpg:500kb, png", 80)
+
+    assert [(spec["format"], spec["suffix"]) for spec in specs] == [("webp", "_2048"), ("jpg", "_2"), ("png", "_3")]
+    assert specs[0]["size"] == (2048, 2048)
+    assert specs[1]["quality"] == 80
+    assert specs[1]["target_bytes"] == 500 * 1024
+
+
+@pytest.mark.parametrize("text", ["webp:85:2048, webp:60:2048", "jpg, jpg:80:1"])
+def test_parse_output_specs_rejects_colliding_outputs(text):
+    with pytest.raises(ValueError):
+        app.parse_output_specs(text, 80)
+
+
+def test_unique_output_stems_keeps_same_named_files_apart():
+    stems = app.unique_output_stems(["/a/IMG_1.heic", "/b/IMG_1.heic", "/c/img_1.jpg", "/d/other.png"])
+
+    assert stems == {"/a/IMG_1.heic": "IMG_1", "/b/IMG_1.heic": "IMG_1_2", "/c/img_1.jpg": "img_1_3",
+                     "/d/other.png": "other"}
+
+
+def test_memory_budget_waits_for_room():
+    budget = app.MemoryBudget(100)
+    assert budget.acquire(60)
+
+    admitted = threading.Event()
+    waiter = threading.Thread(target=lambda: budget.acquire(60) and admitted.set())
+    waiter.start()
+    time.sleep(0.2)
+    assert not admitted.is_set()
+
+    budget.release(60)
+    waiter.join(2.0)
+    assert admitted.is_set()
+    assert budget.in_flight == 60
+
+
+def test_memory_budget_admits_an_oversized_job_alone():
+    budget = app.MemoryBudget(100)
+    assert budget.acquire(500)
+
+    cancel = threading.Event()
+    cancel.set()
+    assert not budget.acquire(1, cancel)
+
+    budget.release(500)
+    assert budget.acquire(1, cancel)
@@ -0,0 +1,71 @@
+import os
+import sys
+import threading
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HEICViewerApp as app
+
+
+def make_directory(tmp_path):
+    photos = tmp_path / "photos"
+    photos.mkdir()
+    Image.new("RGB", (64, 48)).save(photos / "a.jpg")
+    Image.new("RGB", (30, 40)).save(photos / "b.png")
+    (photos / "notes.txt").write_text("not an image")
+    return photos
+
+
+def test_refresh_directory_indexes_images(tmp_path):
+    photos = make_directory(tmp_path)
+    index = app.DirectoryIndex(str(tmp_path / "index.sqlite3"))
+
+    entries = index.refresh_directory(str(photos))
+
+    assert sorted(os.path.basename(path) for path in entries) == ["a.jpg", "b.png"]
+    row = entries[str(photos / "a.jpg")]
+    assert (row["width"], row["height"], row["format"]) == (64, 48, "JPEG")
+    assert index.directory_entries(str(photos)) == entries
+
+
+def test_refresh_directory_only_rereads_changed_files(tmp_path, monkeypatch):
+    photos = make_directory(tmp_path)
+    index = app.DirectoryIndex(str(tmp_path / "index.sqlite3"))
+    index.refresh_directory(str(photos))
+
+    read = []
+    read_header_metadata = app.read_header_metadata
+    monkeypatch.setattr(app, "read_header_metadata", lambda path: read.append(path) or read_header_metadata(path))
+
+    Image.new("RGB", (80, 20)).save(photos / "b.png")
+    os.remove(photos / "a.jpg")
+    entries = index.refresh_directory(str(photos))
+
+    assert read == [str(photos / "b.png")]
+    assert list(entries) == [str(photos / "b.png")]
+    assert entries[str(photos / "b.png")]["width"] == 80
+    assert list(index.directory_entries(str(photos))) == [str(photos / "b.png")]
+
+
+def test_cancelled_scan_stops_before_reading(tmp_path):
+    photos = make_directory(tmp_path)
+    index = app.DirectoryIndex(str(tmp_path / "index.sqlite3"))
+    cancel = threading.Event()
+    cancel.set()
+
+    assert index.refresh_directory(str(photos), cancel) == {}
+    assert index.directory_entries(str(photos)) == {}
+
+
+def test_single_files_are_updated_and_removed(tmp_path):
+    photos = make_directory(tmp_path)
+    index = app.DirectoryIndex(str(tmp_path / "index.sqlite3"))
+
+    rows = index.refresh_files([str(photos / "a.jpg"), str(photos / "missing.jpg")])
+    assert list(rows) == [str(photos / "a.jpg")]
+    assert list(index.directory_entries(str(photos))) == [str(photos / "a.jpg")]
+
+    index.remove_files([str(photos / "a.jpg")])
+    assert index.directory_entries(str(photos)) == {}
@@ -0,0 +1,66 @@
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HEICViewerApp as app
+
+
+def inotify_event(mask, name, cookie=0):
+    encoded = name.encode() + b"\0" * (16 - len(name) % 16)
+    return struct.pack("iIII", 1, mask, cookie, len(encoded)) + encoded
+
+
+def drain(watcher):
+    events = []
+    while not watcher.events.empty():
+        events.append(watcher.events.get_nowait())
+    return events
+
+
+def test_rename_split_across_reads_is_still_a_rename(tmp_path):
+    watcher = app.DirectoryWatcher(str(tmp_path))
+
+    watcher.handle_inotify_events(inotify_event(watcher.IN_MOVED_FROM, "a.jpg", cookie=7))
+    assert drain(watcher) == []
+
+    watcher.handle_inotify_events(inotify_event(watcher.IN_MOVED_TO, "b.jpg", cookie=7))
+    assert drain(watcher) == [("renamed", str(tmp_path / "a.jpg"), str(tmp_path / "b.jpg"))]
+
+
+def test_unmatched_move_becomes_removed_after_the_next_read(tmp_path):
+    watcher = app.DirectoryWatcher(str(tmp_path))
+
+    watcher.handle_inotify_events(inotify_event(watcher.IN_MOVED_FROM, "a.jpg", cookie=7))
+    watcher.handle_inotify_events(inotify_event(watcher.IN_CREATE, "c.jpg"))
+    assert drain(watcher) == [("added", str(tmp_path / "c.jpg")), ("removed", str(tmp_path / "a.jpg"))]
+
+    watcher.handle_inotify_events(inotify_event(watcher.IN_MOVED_FROM, "d.jpg", cookie=8))
+    watcher.flush_moves()
+    assert drain(watcher) == [("removed", str(tmp_path / "d.jpg"))]
+
+
+def test_polling_reports_files_rewritten_in_place(tmp_path, monkeypatch):
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"one")
+    monkeypatch.setattr(app.DirectoryWatcher, "POLL_INTERVAL", 0.05)
+
+    watcher = app.DirectoryWatcher(str(tmp_path))
+    watcher.thread = app.Thread(target=watcher.watch_polling, daemon=True)
+    watcher.start()
+    try:
+        assert watcher.ready.wait(2.0)
+        photo.write_bytes(b"rewritten")
+        (tmp_path / "new.png").write_bytes(b"new")
+
+        deadline = time.monotonic() + 2.0
+        events = []
+        while len(events) < 2 and time.monotonic() < deadline:
+            events += drain(watcher)
+            time.sleep(0.05)
+    finally:
+        watcher.stop()
+
+    assert sorted(events) == [("added", str(tmp_path / "new.png")), ("added", str(photo))]
@@ -0,0 +1,32 @@
+import os
+import sys
+
+from PIL import Image
+from pillow_heif import register_heif_opener
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HEICViewerApp as app
+
+
+def test_heic_embedded_thumbnail_round_trip(tmp_path):
+    register_heif_opener()
+    file_path = str(tmp_path / "photo.heic")
+    Image.new("RGB", (1024, 768), (200, 40, 20)).save(file_path, thumbnails=[256])
+
+    thumb = app.load_embedded_thumbnail(file_path, 160)
+    assert thumb is not None
+    assert max(thumb.size) == 256
+    assert thumb.size[0] > thumb.size[1]
+
+    assert app.load_embedded_thumbnail(file_path, 512) is None
+
+
+def test_thumbnail_cache_generates_heic_thumbnail(tmp_path):
+    register_heif_opener()
+    file_path = str(tmp_path / "photo.heic")
+    Image.new("RGB", (1024, 768), (200, 40, 20)).save(file_path, thumbnails=[256])
+
+    cache = app.ThumbnailCache(str(tmp_path / "cache"), thumb_size=160)
+    thumb = cache.generate(file_path)
+    assert thumb.size == (160, 120)
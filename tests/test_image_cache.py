@@ -0,0 +1,45 @@
+import os
+import sys
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HEICViewerApp as app
+
+
+def image(side):
+    return Image.new("RGB", (side, side))
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = app.ImageCache(3 * 100 * 100 * 3)
+    for key in "abc":
+        cache.put(key, image(100))
+
+    assert cache.get("a") is not None
+    cache.put("d", image(100))
+
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+    assert cache.size == 3 * 100 * 100 * 3
+
+
+def test_oversized_images_are_not_cached_and_shrinking_evicts():
+    cache = app.ImageCache(100 * 100 * 3)
+    cache.put("big", image(200))
+    assert cache.get("big") is None
+    assert cache.size == 0
+
+    cache.put("a", image(100))
+    cache.set_limit(50 * 50 * 3)
+    assert cache.get("a") is None
+    assert cache.size == 0
+
+
+def test_replacing_an_entry_keeps_the_size_accurate():
+    cache = app.ImageCache(10 ** 6)
+    cache.put("a", image(100))
+    cache.put("a", image(50))
+    assert cache.size == 50 * 50 * 3
+    assert app.ImageCache.image_bytes(Image.new("I;16", (10, 10))) == 200
@@ -0,0 +1,124 @@
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HEICViewerApp as app
+
+
+def gradient(size=(64, 32)):
+    img = Image.new("RGB", size)
+    img.putdata([(x * 4, y * 8, 0) for y in range(size[1]) for x in range(size[0])])
+    return img
+
+
+def save_with_orientation(file_path, orientation):
+    exif = Image.Exif()
+    exif[app.EXIF_TAG_ORIENTATION] = orientation
+    if file_path.endswith(".jpg"):
+        gradient().save(file_path, quality=98, exif=exif.tobytes())
+    else:
+        gradient().save(file_path, exif=exif.tobytes())
+
+
+@pytest.mark.parametrize("method", list(app.LOSSLESS_OPERATIONS.values()) + [Image.TRANSPOSE, Image.TRANSVERSE])
+@pytest.mark.parametrize("orientation", range(1, 9))
+def test_compose_orientation_matches_applying_both(orientation, method):
+    probe = gradient((5, 3))
+    composed = app.compose_orientation(orientation, method)
+
+    expected = probe
+    if app.ORIENTATION_TRANSPOSES[orientation] is not None:
+        expected = expected.transpose(app.ORIENTATION_TRANSPOSES[orientation])
+    expected = expected.transpose(method)
+
+    actual = probe
+    if app.ORIENTATION_TRANSPOSES[composed] is not None:
+        actual = actual.transpose(app.ORIENTATION_TRANSPOSES[composed])
+    assert actual.tobytes() == expected.tobytes()
+
+
+def test_compose_orientation_known_values():
+    assert app.compose_orientation(1, Image.ROTATE_270) == 6
+    assert app.compose_orientation(6, Image.ROTATE_90) == 1
+    assert app.compose_orientation(3, Image.ROTATE_180) == 1
+    assert app.compose_orientation(2, Image.FLIP_LEFT_RIGHT) == 1
+
+
+@pytest.mark.parametrize("extension", [".jpg", ".tif"])
+@pytest.mark.parametrize("orientation", range(1, 9))
+def test_saved_orientation_matches_the_rotated_view(tmp_path, extension, orientation):
+    file_path = str(tmp_path / f"photo{extension}")
+    save_with_orientation(file_path, orientation)
+
+    decoded = app.decode_frame(file_path)
+    shown = decoded.transpose(Image.ROTATE_90)
+    app.rotate_file_losslessly(file_path, Image.ROTATE_90, decoded.info.get("applied_orientation"))
+
+    reloaded = app.decode_frame(file_path)
+    assert reloaded.size == shown.size
+    assert max(abs(a - b) for a, b in zip(reloaded.tobytes(), shown.tobytes())) <= 8
+
+
+def test_tiff_orientation_is_recorded_before_pillow_applies_it(tmp_path):
+    file_path = str(tmp_path / "photo.tif")
+    save_with_orientation(file_path, 8)
+
+    decoded = app.decode_frame(file_path)
+    assert decoded.info["applied_orientation"] == 8
+    assert decoded.tobytes() == gradient().transpose(Image.ROTATE_90).tobytes()
+
+
+def test_jpeg_scan_data_is_untouched(tmp_path):
+    file_path = str(tmp_path / "photo.jpg")
+    gradient().save(file_path, quality=95)
+    with open(file_path, "rb") as f:
+        scan = f.read().split(b"\xff\xda", 1)[1]
+
+    assert app.rotate_file_losslessly(file_path, Image.ROTATE_270) == 6
+    with open(file_path, "rb") as f:
+        assert f.read().split(b"\xff\xda", 1)[1] == scan
+
+
+def test_heif_rotation_round_trip(tmp_path):
+    app.ensure_heif_support()
+    file_path = str(tmp_path / "photo.heic")
+    gradient().save(file_path, quality=95)
+    expected = app.decode_frame(file_path)
+
+    for method in (Image.ROTATE_90, Image.FLIP_LEFT_RIGHT, Image.FLIP_LEFT_RIGHT, Image.TRANSPOSE):
+        app.rotate_file_losslessly(file_path, method)
+        expected = expected.transpose(method)
+        assert app.decode_frame(file_path).tobytes() == expected.tobytes()
+
+
+def test_apply_exif_orientation_turns_the_pixels(tmp_path):
+    file_path = str(tmp_path / "photo.jpg")
+    save_with_orientation(file_path, 6)
+
+    with Image.open(file_path) as img:
+        img.load()
+        upright = app.apply_exif_orientation(img)
+
+    assert upright.size == (32, 64)
+    assert upright.info["applied_orientation"] == 6
+    assert max(abs(a - b) for a, b in zip(upright.tobytes(),
+                                          gradient().transpose(Image.ROTATE_270).tobytes())) <= 8
+
+
+def test_apply_exif_orientation_leaves_upright_images_alone(tmp_path):
+    file_path = str(tmp_path / "photo.jpg")
+    save_with_orientation(file_path, 1)
+
+    with Image.open(file_path) as img:
+        img.load()
+        assert "applied_orientation" not in app.apply_exif_orientation(img).info
+
+    # A tag the loader already applied is recorded without turning the pixels again
+    img = gradient()
+    assert app.apply_exif_orientation(img, 8) is img
+    assert img.info["applied_orientation"] == 8
+    assert img.size == (64, 32)
@@ -0,0 +1,42 @@
+import os
+import sys
+
+from PIL import Image, ImageChops
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HEICViewerApp as app
+
+
+def gradient(size):
+    red = Image.linear_gradient("L").resize(size)
+    green = red.transpose(Image.ROTATE_90).resize(size)
+    return Image.merge("RGB", (red, green, Image.new("L", size, 90)))
+
+
+def test_write_tiled_tiff_round_trip(tmp_path):
+    file_path = str(tmp_path / "tiled.tif")
+    image = gradient((700, 500))
+
+    app.write_tiled_tiff(file_path, image, tile_size=256, compression="deflate")
+
+    with Image.open(file_path) as saved:
+        assert saved.size == (700, 500)
+        assert saved.tag_v2[322] == 256  # TileWidth
+        assert ImageChops.difference(saved.convert("RGB"), image).getbbox() is None
+
+
+def test_pyramid_level_is_chosen_from_headers(tmp_path, monkeypatch):
+    file_path = str(tmp_path / "pyramid.tif")
+    app.write_tiled_tiff(file_path, gradient((2048, 1024)), tile_size=256, compression="deflate")
+
+    opened = []
+    open_level = app.open_tiff_subifd
+    monkeypatch.setattr(app, "open_tiff_subifd",
+                        lambda *args: opened.append(args[2]) or open_level(*args))
+
+    thumb = app.load_embedded_thumbnail(file_path, 0, 300)
+    assert thumb.size == (512, 256)
+    assert len(opened) == 1
+
+    assert max(app.load_embedded_thumbnail(file_path, 0, 5000).size) == 1024